@@ -0,0 +1,223 @@
+"""Async serving mode: uvicorn asgi:app
+
+The storefront pages (home, product detail, category search) run as coroutines, so one worker keeps
+many requests in flight while they wait on MongoDB, and independent lookups within a request go out
+together via asyncio.gather. They run inside a normal Flask request context, so templates, url_for,
+sessions, flashes, Flask-Login and the after_request hooks behave exactly as in flask_ecommerce.
+Every other route (cart, checkout, admin, images, ...) is served by the WSGI app on a thread pool.
+
+MongoDB calls go through Motor when it is installed (Motor 3 needs pymongo 4). With the pinned
+pymongo 3.x they run on a dedicated thread pool over the app's own client instead -- the same model
+Motor uses internally (Motor 2.x, the pymongo 3 line, does not import on Python 3.11).
+
+Needs: pip install a2wsgi uvicorn
+"""
+import asyncio
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from flask import flash, g, redirect, request, session, url_for
+from pymongo.errors import OperationFailure
+from werkzeug.exceptions import HTTPException
+
+import flask_ecommerce as shop
+from request_metrics import record_db_command
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:  # optional, see module docstring
+    AsyncIOMotorClient = None
+
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", 16))  # threads for the routes served by the WSGI app
+ASGI_DB_THREADS = int(os.getenv("ASGI_DB_THREADS", shop.MONGO_MAX_POOL_SIZE))  # without Motor: concurrent db calls
+
+_motor = {}
+_db_pool = ThreadPoolExecutor(max_workers=ASGI_DB_THREADS, thread_name_prefix="asgi-db")
+
+
+def mdb():
+    """Motor database of this process (created on first use, after any fork, like mongo_conn.Mongo)."""
+    if _motor.get("pid") != os.getpid():
+        client = AsyncIOMotorClient(shop.MONGO_URI, **shop.mongo.client_options)
+        _motor.update(pid=os.getpid(), client=client, db=client[shop.DB_NAME])
+    return _motor["db"]
+
+
+async def find(coll, query, projection=None, sort=None, skip=0, limit=0):
+    """List of matching docs, awaited; the query runs on Motor or on the db thread pool."""
+    started = time.perf_counter()
+    try:
+        if AsyncIOMotorClient is not None:
+            return await _cursor(mdb()[coll], query, projection, sort, skip, limit).to_list(None)
+        cursor = _cursor(shop.db[coll], query, projection, sort, skip, limit)
+        return await asyncio.get_running_loop().run_in_executor(_db_pool, list, cursor)
+    finally:
+        record_db_command(time.perf_counter() - started)  # Server-Timing / metrics db time
+
+
+async def count(coll, query):
+    started = time.perf_counter()
+    try:
+        if AsyncIOMotorClient is not None:
+            return await mdb()[coll].count_documents(query)
+        return await asyncio.get_running_loop().run_in_executor(_db_pool, shop.db[coll].count_documents, query)
+    finally:
+        record_db_command(time.perf_counter() - started)
+
+
+async def find_one(coll, query, projection=None):
+    docs = await find(coll, query, projection, limit=1)
+    return docs[0] if docs else None
+
+
+def _cursor(collection, query, projection, sort, skip, limit):
+    cursor = collection.find(query, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    return cursor.skip(skip).limit(limit)
+
+
+async def _load_user():
+    user_id = session.get("_user_id")
+    user = shop.cached_user(user_id) if user_id else None
+    if user_id and user is None:
+        uid = shop.oid(user_id)
+        doc = await find_one("users", {"_id": uid}, shop.USER_FIELDS) if uid else None
+        user = shop.cache_user(user_id, doc)
+    g._login_user = user or shop.login_manager.anonymous_user()  # what flask_login.current_user reads
+    return g._login_user
+
+
+def current_user_loaded():
+    """The request's user-loading task (started by the dispatcher); await it before using current_user."""
+    return g._user_load
+
+
+# ---- views ----
+@shop.page_cache.cached_async
+async def index():
+    size = shop.page_size_arg()
+    q, sort, pos, backwards = shop.keyset_find_args(
+        {"status": "active"}, request.args.get("after"), request.args.get("before"))
+    docs, _ = await asyncio.gather(
+        find("products", q, shop.LISTING_FIELDS, sort, limit=size + 1),
+        current_user_loaded(),
+    )
+    return shop.render_index(*shop.keyset_result(docs, size, pos, backwards), size)
+
+
+@shop.page_cache.cached_async
+async def product_detail(product_id):
+    pid = shop.oid(product_id)
+    if not pid:
+        flash("Invalid product ID", "error")
+        return redirect(url_for("index"))
+    p, _ = await asyncio.gather(
+        find_one("products", {"_id": pid}, shop.DETAIL_FIELDS),
+        current_user_loaded(),
+    )
+    if not p:
+        flash("Product not found", "error")
+        return redirect(url_for("index"))
+    cat_names = p.get("categoryPaths")
+    if cat_names is None:  # not yet backfilled by sync-product-categories
+        cats = await find("categories", {"_id": {"$in": p.get("categoryIds") or []}}, {"path": 1})
+        cat_names = [c["path"] for c in cats]
+    return shop.render_product_detail(p, cat_names)
+
+
+async def categories_home():
+    if not (await current_user_loaded()).is_authenticated:
+        return shop.login_manager.unauthorized()
+    # the category tree is the shared per-worker cache; a version check or reload runs on the db pool
+    tree = shop.category_cache.peek() or await asyncio.get_running_loop().run_in_executor(_db_pool, shop.category_cache.tree)
+    keyword, selected, query = shop.category_search_args(tree)
+    products, page, size, has_next = [], shop.page_arg(), shop.page_size_arg(), False
+    if query is not None:
+        products, has_next = await search_products(query, keyword, page, size)
+    return shop.render_categories(tree, products, keyword, selected, page, size, has_next)
+
+
+async def search_products(query, keyword, page, size):
+    """flask_ecommerce.search_products; on page 1 the main and SKU-prefix queries are issued concurrently
+    (the main query starts at 0 there, so it does not depend on the SKU hit count)."""
+    try:
+        return await _search_page(query, keyword, page, size, text=True)
+    except OperationFailure as e:
+        if not shop.text_index_missing(e):
+            raise
+        return await _search_page(query, keyword, page, size, text=False)
+
+
+async def _search_page(query, keyword, page, size, text):
+    q, projection, sort = shop.search_find_args(query, keyword, text)
+    offset = (page - 1) * size
+    sku_q = shop.sku_prefix_query(query, keyword, text)
+    if not sku_q:
+        return shop.merge_search_results(await find("products", q, projection, sort, offset, size + 1), [], size)
+    sku_find = find("products", sku_q, shop.LISTING_FIELDS, [("sku", 1)], offset, size + 1)
+    if page == 1:
+        sku_hits, docs = await asyncio.gather(sku_find, find("products", q, projection, sort, limit=size + 1))
+        return shop.merge_search_results(docs, sku_hits, size)
+    sku_hits = await sku_find
+    if len(sku_hits) > size:
+        return sku_hits[:size], True
+    sku_total = offset + len(sku_hits) if sku_hits else await count("products", sku_q)
+    docs = await find("products", q, projection, sort, max(0, offset - sku_total), size - len(sku_hits) + 1)
+    return shop.merge_search_results(docs, sku_hits, size)
+
+
+ASYNC_VIEWS = {"index": index, "product_detail": product_detail, "categories_home": categories_home}
+
+
+class AsyncStorefront:
+    """ASGI app: endpoints in `views` are awaited in a Flask request context, the rest go to the WSGI app."""
+
+    def __init__(self, flask_app, views, wsgi_threads=ASGI_WSGI_THREADS):
+        self.flask_app = flask_app
+        self.views = views
+        self.wsgi = WSGIMiddleware(flask_app, workers=wsgi_threads)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] in ("GET", "HEAD"):
+            environ = build_environ(scope, io.BytesIO())
+            try:
+                endpoint, args = self.flask_app.url_map.bind_to_environ(environ).match()
+            except HTTPException:  # 404s, redirects for missing slashes, ...: let Flask produce them
+                endpoint = None
+            view = self.views.get(endpoint)
+            if view is not None:
+                response = await self._dispatch(view, environ, args)
+                await send({
+                    "type": "http.response.start",
+                    "status": response.status_code,
+                    "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in response.headers.items()],
+                })
+                await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else response.get_data()})
+                return
+        await self.wsgi(scope, receive, send)
+
+    async def _dispatch(self, view, environ, args):
+        """Flask's full_dispatch_request for a coroutine view."""
+        app = self.flask_app
+        with app.request_context(environ):
+            try:
+                try:
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        g._user_load = asyncio.ensure_future(_load_user())
+                        rv = await view(**args)
+                        await g._user_load  # after_request hooks / templates may still read current_user
+                except Exception as e:
+                    rv = app.handle_user_exception(e)
+                return app.finalize_request(rv)
+            except Exception as e:
+                return app.handle_exception(e)
+
+
+shop.page_cache.executor = _db_pool  # Redis page cache calls from cached_async
+app = AsyncStorefront(shop.app, ASYNC_VIEWS)
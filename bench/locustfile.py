@@ -0,0 +1,70 @@
+"""Locust scenario for the same routes as bench/run.py, for load from several machines.
+
+    pip install locust
+    python bench/run.py --seed --routes home --requests 1   # seed $MONGODB_URI once
+    locust -f bench/locustfile.py --host http://127.0.0.1:8000 -u 50 -r 10
+
+Ids are read from $MONGODB_URI at start-up, so point it at the database the server uses.
+"""
+import itertools
+import os
+import random
+import sys
+
+from locust import HttpUser, between, events, task
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from run import collect_ids, load_app
+from seed import BENCH_PASSWORD, user_email
+from synthetic import WORDS
+
+IDS = {}
+_user_numbers = itertools.count()
+
+
+@events.init.add_listener
+def _load_ids(environment, **kwargs):
+    m = load_app(False)
+    IDS.update(collect_ids(m, WORDS))
+    IDS["users"] = m.db.users.count_documents({"email": {"$regex": r"^bench\d+@"}})
+
+
+class Shopper(HttpUser):
+    wait_time = between(0.1, 0.5)
+
+    def on_start(self):
+        n = next(_user_numbers) % max(1, IDS["users"])
+        self.client.post("/login", {"email": user_email(n), "password": BENCH_PASSWORD}, allow_redirects=False)
+
+    @task(5)
+    def home(self):
+        self.client.get("/")
+
+    @task(5)
+    def product(self):
+        self.client.get(f"/products/view/{random.choice(IDS['products'])}", name="/products/view/[id]")
+
+    @task(3)
+    def image(self):
+        if IDS["images"]:
+            self.client.get(f"/image/{random.choice(IDS['images'])}?size=listing", name="/image/[id]")
+
+    @task(3)
+    def categories(self):
+        self.client.get(f"/categories?cat={random.choice(IDS['categories'])}", name="/categories?cat")
+
+    @task(2)
+    def search(self):
+        self.client.get(f"/categories?q={random.choice(IDS['words'])}", name="/categories?q")
+
+    @task(2)
+    def cart(self):
+        self.client.get("/cart")
+
+    @task(1)
+    def add_and_checkout(self):
+        self.client.post("/cart/add", {"product_id": str(random.choice(IDS["products"])), "qty": "1"},
+                         allow_redirects=False)
+        self.client.post("/checkout", allow_redirects=False)
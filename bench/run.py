@@ -0,0 +1,251 @@
+"""Fixed-concurrency benchmark of the main storefront routes.
+
+    python bench/run.py --mongomock --seed                  # in-process app on mongomock
+    python bench/run.py --seed                              # in-process app on $MONGODB_URI
+    python bench/run.py --url http://127.0.0.1:8000         # a running server (ids are read from $MONGODB_URI)
+    python bench/run.py --mongomock --seed --out base.json  # save a baseline ...
+    python bench/run.py --mongomock --seed --baseline base.json  # ... and compare against it
+
+Each route is driven in turn by --concurrency threads, each logged in as its own seeded user, for
+--requests requests in total (after --warmup unmeasured ones). Reports p50/p95/p99 latency and
+requests/sec per route; with --baseline, exits 1 if any route's p95 or throughput regressed by more
+than --tolerance.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(use_mongomock):
+    if use_mongomock:
+        import mongomock
+        import mongomock.gridfs
+        import pymongo
+
+        mongomock.gridfs.enable_gridfs_integration()
+        os.environ.setdefault("MIN_TEXT_QUERY", "1000")  # mongomock has no $text: search via the regex fallback
+        pymongo.MongoClient = mongomock.MongoClient  # must happen before the app imports it
+    import flask_ecommerce
+
+    return flask_ecommerce
+
+
+# ---- clients ----
+class InProcessClient:
+    def __init__(self, app):
+        self.c = app.test_client()
+
+    def request(self, method, path, data=None):
+        r = self.c.open(path, method=method, data=data)
+        r.close()
+        return r.status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base = base_url.rstrip("/")
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect)
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base + path, data=body, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as r:
+                r.read()
+                return r.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+# ---- scenarios: name -> (untimed setup or None, timed request) ----
+def _add(client, ids, rng):
+    return "POST", "/cart/add", {"product_id": str(rng.choice(ids["products"])), "qty": "1"}
+
+
+SCENARIOS = {
+    "home": (None, lambda c, ids, rng: ("GET", "/", None)),
+    "product": (None, lambda c, ids, rng: ("GET", f"/products/view/{rng.choice(ids['products'])}", None)),
+    "image": (None, lambda c, ids, rng: ("GET", f"/image/{rng.choice(ids['images'])}?size=listing", None)),
+    "categories": (None, lambda c, ids, rng: ("GET", f"/categories?cat={rng.choice(ids['categories'])}", None)),
+    "search": (None, lambda c, ids, rng: ("GET", f"/categories?q={rng.choice(ids['words'])}", None)),
+    "cart": (None, lambda c, ids, rng: ("GET", "/cart", None)),
+    "cart_add": (None, _add),
+    "checkout": (lambda c, ids, rng: c.request(*_add(c, ids, rng)), lambda c, ids, rng: ("POST", "/checkout", {})),
+}
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, round(p / 100.0 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+def collect_ids(app_module, words):
+    db = app_module.db
+    ids = {
+        "products": [p["_id"] for p in db.products.find({"status": "active"}, {"_id": 1}).limit(5000)],
+        "categories": [c["_id"] for c in db.categories.find({}, {"_id": 1})],
+        "images": [f["_id"] for f in db.fs.files.find({"variantOf": {"$exists": False}}, {"_id": 1}).limit(1000)],
+        "words": list(words),
+    }
+    if not ids["products"]:
+        raise SystemExit("no products found: run with --seed (or seed the database first)")
+    return ids
+
+
+def run_route(name, clients, ids, total, warmup, rng_seed):
+    setup, build = SCENARIOS[name]
+    if name == "image" and not ids["images"]:
+        return None
+    latencies, errors, lock = [], [0], threading.Lock()
+    per_thread = [total // len(clients) + (i < total % len(clients)) for i in range(len(clients))]
+
+    def worker(i, client, n, measured):
+        rng = random.Random(rng_seed * 1000 + i)
+        local, errs = [], 0
+        for _ in range(n):
+            if setup:
+                setup(client, ids, rng)
+            method, path, data = build(client, ids, rng)
+            t0 = time.perf_counter()
+            status = client.request(method, path, data)
+            local.append(time.perf_counter() - t0)
+            errs += status >= 400
+        if measured:
+            with lock:
+                latencies.extend(local)
+                errors[0] += errs
+
+    def phase(counts, measured):
+        threads = [threading.Thread(target=worker, args=(i, c, n, measured)) for i, (c, n) in enumerate(zip(clients, counts))]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - start
+
+    if warmup:
+        phase([max(1, warmup // len(clients))] * len(clients), False)
+    wall = phase(per_thread, True)
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Rows of (route, metric, baseline, current, change) that regressed by more than `tolerance`."""
+    regressions = []
+    for route, cur in results.items():
+        base = baseline.get(route)
+        if not base:
+            continue
+        if base["p95_ms"] and cur["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append((route, "p95_ms", base["p95_ms"], cur["p95_ms"], cur["p95_ms"] / base["p95_ms"] - 1))
+        if base["rps"] and cur["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append((route, "rps", base["rps"], cur["rps"], cur["rps"] / base["rps"] - 1))
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    ap.add_argument("--mongomock", action="store_true", help="in-process app on mongomock instead of MongoDB")
+    ap.add_argument("--seed", action="store_true", help="drop and re-seed the synthetic catalog first")
+    ap.add_argument("--products", type=int, default=2000)
+    ap.add_argument("--depth", type=int, default=3)
+    ap.add_argument("--branching", type=int, default=4)
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--cart-items", type=int, default=3)
+    ap.add_argument("--images", type=int, default=20)
+    ap.add_argument("--routes", default=",".join(SCENARIOS), help="comma separated subset of: " + ", ".join(SCENARIOS))
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=400, help="measured requests per route")
+    ap.add_argument("--warmup", type=int, default=40, help="unmeasured requests per route")
+    ap.add_argument("--rng-seed", type=int, default=1)
+    ap.add_argument("--out", help="write results as JSON (usable as a --baseline later)")
+    ap.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="allowed p95/rps regression (fraction)")
+    args = ap.parse_args(argv)
+
+    if args.url and args.mongomock:
+        ap.error("--mongomock only applies to the in-process app")
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    unknown = [r for r in routes if r not in SCENARIOS]
+    if unknown:
+        ap.error(f"unknown routes: {', '.join(unknown)}")
+
+    if args.mongomock and args.concurrency > 1:
+        print("note: mongomock is not thread-safe, running with --concurrency 1")
+        args.concurrency = 1
+    m = load_app(args.mongomock)
+    from seed import BENCH_PASSWORD, seed, user_email
+    from synthetic import WORDS
+
+    if args.seed:
+        seed(m, products=args.products, depth=args.depth, branching=args.branching, users=args.users,
+             cart_items=args.cart_items, images=args.images, rng_seed=args.rng_seed)
+    ids = collect_ids(m, WORDS)
+    n_users = m.db.users.count_documents({"email": {"$regex": r"^bench\d+@"}})
+    if not n_users:
+        raise SystemExit("no bench users found: run with --seed")
+
+    clients = []
+    for i in range(args.concurrency):
+        c = HttpClient(args.url) if args.url else InProcessClient(m.app)
+        c.request("POST", "/login", {"email": user_email(i % n_users), "password": BENCH_PASSWORD})
+        clients.append(c)
+
+    results = {}
+    print(f"{'route':<12}{'reqs':>7}{'errs':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route in routes:
+        r = run_route(route, clients, ids, args.requests, args.warmup, args.rng_seed)
+        if r is None:
+            print(f"{route:<12} skipped (no data)")
+            continue
+        results[route] = r
+        print(f"{route:<12}{r['requests']:>7}{r['errors']:>6}{r['rps']:>10.1f}"
+              f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+                       "results": results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for route, metric, old, new, change in regressions:
+            print(f"REGRESSION {route} {metric}: {old:.2f} -> {new:.2f} ({change:+.0%})")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
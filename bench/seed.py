@@ -0,0 +1,53 @@
+"""Synthetic catalog for the benchmarks: nested categories, products, users with carts, GridFS images.
+
+Catalog, users and carts come from synthetic.generate (the same generator as `flask seed-data`);
+images go through the app's store_image so they get the usual resized variants.
+"""
+import io
+import random
+
+from synthetic import generate
+
+BENCH_PASSWORD = "bench"
+COLLECTIONS = ("categories", "products", "users", "carts", "orders", "fs.files", "fs.chunks", "query_audit")
+
+
+def user_email(i):
+    return f"bench{i}@example.com"
+
+
+def _png(rng, side=640):
+    try:
+        from PIL import Image
+    except ImportError:
+        return rng.randbytes(side * 8), "application/octet-stream"
+    img = Image.new("RGB", (side, side), tuple(rng.randrange(256) for _ in range(3)))
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue(), "image/png"
+
+
+def seed(app_module, products=2000, depth=3, branching=4, users=20, cart_items=3, images=20,
+         batch_size=1000, rng_seed=1, log=print):
+    """Drop and re-create the benchmark data set. Returns a summary dict."""
+    db = app_module.db
+    for name in COLLECTIONS:
+        db.drop_collection(name)
+
+    summary = generate(
+        db, products=products, depth=depth, branching=branching, users=users, carts_per_user=cart_items,
+        batch_size=batch_size, workers=1, rng_seed=rng_seed, stock=10 ** 6, email_format=user_email("{}"),
+        password=BENCH_PASSWORD, cart_schema_version=app_module.CART_SCHEMA_VERSION, log=lambda msg: None,
+    )
+    rng = random.Random(rng_seed)
+    summary["images"] = 0
+    for p in db.products.find({"status": "active"}, {"_id": 1}).sort("createdAt", -1).limit(images):
+        data, ctype = _png(rng)
+        fid = app_module.store_image(data, f"{p['_id']}.png", ctype, p["_id"])
+        db.products.update_one({"_id": p["_id"]}, {"$push": {"imageIds": fid}})
+        summary["images"] += 1
+    app_module.category_cache.bump()
+    app_module.page_cache.invalidate()
+
+    log("seeded " + ", ".join(f"{k}={v}" for k, v in summary.items()))
+    return summary
@@ -0,0 +1,72 @@
+import threading
+import time
+
+VERSION_KEY = "categories_version"  # _id of the counter doc in db.settings
+
+
+class CategoryTree:
+    """Immutable snapshot of the categories collection (sorted by path)."""
+
+    def __init__(self, docs, version):
+        self.version = version
+        self.nodes = sorted(docs, key=lambda c: c["path"])
+        self.by_id = {c["_id"]: c for c in self.nodes}
+        self.by_path = {c["path"]: c for c in self.nodes}
+        self.children = {}
+        for c in self.nodes:
+            self.children.setdefault(c.get("parentId"), []).append(c)
+
+    def descendant_ids(self, cat_ids):
+        """The given ids plus every category below them."""
+        out, stack = set(), list(cat_ids)
+        while stack:
+            cid = stack.pop()
+            if cid in out:
+                continue
+            out.add(cid)
+            stack.extend(c["_id"] for c in self.children.get(cid, ()))
+        return out
+
+
+class CategoryCache:
+    """Per-worker CategoryTree, reloaded when the version counter in db.settings changes.
+
+    Writers call bump(); readers re-check the counter at most every `check_interval` seconds,
+    so other workers pick up a change within that window.
+    """
+
+    def __init__(self, db, check_interval=2.0):
+        self.db = db
+        self.check_interval = check_interval
+        self._tree = None
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+
+    def _version(self):
+        return (self.db.settings.find_one({"_id": VERSION_KEY}) or {}).get("value", 0)
+
+    def peek(self):
+        """The cached tree if it needs no version check yet, else None; never touches MongoDB."""
+        tree = self._tree
+        if tree is not None and time.monotonic() - self._checked < self.check_interval:
+            return tree
+        return None
+
+    def tree(self, fresh=False):
+        """The current tree; `fresh` re-checks the version now (for writes that must see every category)."""
+        now = time.monotonic()
+        tree = self._tree
+        if not fresh and tree is not None and now - self._checked < self.check_interval:
+            return tree
+        with self._lock:
+            if not fresh and self._tree is not None and now - self._checked < self.check_interval:
+                return self._tree
+            version = self._version()
+            if self._tree is None or self._tree.version != version:
+                self._tree = CategoryTree(self.db.categories.find({}), version)
+            self._checked = now
+            return self._tree
+
+    def bump(self):
+        self.db.settings.update_one({"_id": VERSION_KEY}, {"$inc": {"value": 1}}, upsert=True)
+        self._checked = float("-inf")
@@ -1,42 +1,101 @@
 
+import io
 import os
 import re
-from datetime import datetime
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from functools import wraps
+from itertools import groupby
 
-from flask import Flask, render_template, request, redirect, url_for, flash, Response
-from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
+import click
+
+from flask import Flask, render_template, request, redirect, url_for, flash, Response, stream_with_context
+from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from bson import ObjectId
-from pymongo import MongoClient,ASCENDING, DESCENDING, TEXT
-from gridfs import GridFS
+from pymongo import ASCENDING, DESCENDING, DeleteMany, DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
 from dotenv import load_dotenv
+from werkzeug.http import http_date
+from werkzeug.local import LocalProxy
+
+from category_cache import CategoryCache
+from image_cache import ImageCache
+from image_variants import IMAGE_VARIANTS, make_variants
+from indexes import INDEX_SPECS, ensure_indexes, find_duplicates
+from jobs import JobRunner
+from mongo_conn import Mongo
+from mongo_metrics import MongoMetrics
+from query_audit import QueryAuditor
+from request_metrics import RequestMetrics
+from page_cache import PageCache
+from product_io import export_products, import_products, read_rows
+from synthetic import generate as generate_synthetic
 
 load_dotenv()
 
 
 MONGO_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "ecommerce")
+# connection pool (per process; with gunicorn multiply by the number of workers)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 20000))
+QUERY_AUDIT = os.getenv("QUERY_AUDIT", "") == "1"  # dev/staging only: explain every distinct query shape
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", 24))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 30))
+USER_CACHE_MAX = int(os.getenv("USER_CACHE_MAX", 10000))
+CATEGORY_CACHE_CHECK_SECONDS = float(os.getenv("CATEGORY_CACHE_CHECK_SECONDS", 2))
+PAGE_CACHE_URL = os.getenv("PAGE_CACHE_URL", "")  # empty = in-process; redis://... = shared
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", 30))
+PAGE_CACHE_MAX_ITEMS = int(os.getenv("PAGE_CACHE_MAX_ITEMS", 1000))
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", 500))
+JOB_BATCH_PAUSE = float(os.getenv("JOB_BATCH_PAUSE", 0.05))  # seconds between background write batches
+IMAGE_CACHE_BYTES = int(os.getenv("IMAGE_CACHE_BYTES", 64 * 1024 * 1024))
+IMAGE_CACHE_ITEM_BYTES = int(os.getenv("IMAGE_CACHE_ITEM_BYTES", 2 * 1024 * 1024))
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "")  # empty = memory tier only
+IMAGE_CACHE_DISK_BYTES = int(os.getenv("IMAGE_CACHE_DISK_BYTES", 1024 * 1024 * 1024))
+IMAGE_CACHE_MEM_SECONDS = float(os.getenv("IMAGE_CACHE_MEM_SECONDS", 300))  # memory entry lifetime
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 100))
+MIN_TEXT_QUERY = int(os.getenv("MIN_TEXT_QUERY", 3))  # shorter keywords use a regex instead of $text
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "dev-secret")
 
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
-fs = GridFS(db)
-
-# --- create important index (idempotent) ---
-try:
-    db.carts.create_index([("userId", ASCENDING), ("product_id", ASCENDING)], unique=True)
-    db.categories.create_index([("path", ASCENDING)])                   
-    # db.products.create_index([("status", ASCENDING), ("createdAt", DESCENDING)])
-    db.products.create_index([("createdAt", DESCENDING)])     
-    db.products.create_index([("title", TEXT)]) 
-    db.products.create_index([("sku", ASCENDING)])
-    db.products.create_index([("categoryIds", ASCENDING), ("title", TEXT)])
-    db.products.create_index([("categoryIds", ASCENDING)])
-    
-except Exception:
-    pass
+mongo_metrics = MongoMetrics()
+# per-route latency / db / template timings: Server-Timing header on every response, Prometheus text on /metrics
+request_metrics = RequestMetrics()
+request_metrics.init_app(app)
+query_auditor = QueryAuditor(lambda: mongo.db) if QUERY_AUDIT else None
+# client/db/fs are created lazily per process (see mongo_conn.Mongo), so importing this module
+# (e.g. in a gunicorn --preload master) opens no connections and workers never share one across fork
+mongo = Mongo(
+    MONGO_URI,
+    DB_NAME,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+    event_listeners=mongo_metrics.listeners() + [request_metrics.listener()] + ([query_auditor.listener()] if query_auditor else []),
+)
+client = LocalProxy(lambda: mongo.client)
+db = LocalProxy(lambda: mongo.db)
+fs = LocalProxy(lambda: mongo.fs)
+category_cache = CategoryCache(db, CATEGORY_CACHE_CHECK_SECONDS)
+page_cache = PageCache(PAGE_CACHE_URL, PAGE_CACHE_TTL, PAGE_CACHE_MAX_ITEMS)
+image_cache = ImageCache(IMAGE_CACHE_BYTES, IMAGE_CACHE_ITEM_BYTES, IMAGE_CACHE_DIR, IMAGE_CACHE_DISK_BYTES,
+                         IMAGE_CACHE_MEM_SECONDS)
+jobs = JobRunner(db)
+
+# indexes are declared in indexes.py and applied with `flask --app flask_ecommerce ensure-indexes`
 
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -46,20 +105,78 @@ login_manager.login_message_category = "error"
 
 
 PREFIX_EXTRA='_##_'  # e.g.  color -> _##_color
+# named projections: fetch only what each view renders
+LISTING_FIELDS = {"title": 1, "price": 1, "stock": 1, "createdAt": 1, "imageIds": {"$slice": 1}, "images": {"$slice": 1}}
+ADMIN_TABLE_FIELDS = {"title": 1, "price": 1, "stock": 1, "status": 1, "createdAt": 1}
+DETAIL_FIELDS = {
+    "title": 1, "price": 1, "stock": 1, "status": 1, "categoryIds": 1, "categoryPaths": 1,
+    "imageIds": 1, "images": 1, "extra_attrs": 1,
+}
+CART_FIELDS = {"title": 1, "price": 1, "stock": 1, "status": 1}
+CART_SCHEMA_VERSION = 1  # bump together with _cart_fix_ops when the cart item shape changes
+
+
+class User:
+    """Flask-Login user; implements the UserMixin protocol itself so it can use __slots__."""
+    __slots__ = ("id", "email", "name", "isAdmin")
 
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
 
-class User(UserMixin):
     def __init__(self, doc):
         self.id = str(doc["_id"])
         self.email = doc["email"]
         self.name = doc.get("name") or self.email.split("@")[0]
         self.isAdmin = bool(doc.get("isAdmin"))
 
+    def get_id(self):
+        return self.id
+
+
+_user_cache = OrderedDict()  # user id -> (expires at, User); per worker
+_user_cache_lock = threading.Lock()
+
+
+USER_FIELDS = {"email": 1, "name": 1, "isAdmin": 1}
+
+
+def cached_user(user_id):
+    """The cached User for `user_id`, or None when it has to be (re)loaded."""
+    with _user_cache_lock:
+        hit = _user_cache.get(user_id)
+        if hit and hit[0] > time.monotonic():
+            _user_cache.move_to_end(user_id)
+            return hit[1]
+    return None
+
+
+def cache_user(user_id, doc):
+    """Build the User for a freshly loaded users doc (None if it no longer exists) and cache it."""
+    user = User(doc) if doc else None
+    with _user_cache_lock:
+        if user:
+            _user_cache[user_id] = (time.monotonic() + USER_CACHE_TTL, user)
+            _user_cache.move_to_end(user_id)
+            while len(_user_cache) > USER_CACHE_MAX:
+                _user_cache.popitem(last=False)
+        else:
+            _user_cache.pop(user_id, None)
+    return user
+
 
 @login_manager.user_loader
 def load_user(user_id):
-    u = db.users.find_one({"_id": ObjectId(user_id)})
-    return User(u) if u else None
+    user = cached_user(user_id)
+    if user is None:
+        user = cache_user(user_id, db.users.find_one({"_id": ObjectId(user_id)}, USER_FIELDS))
+    return user
+
+
+def forget_user(user_id):
+    """Drop a cached User after its isAdmin/profile fields change (other workers catch up within USER_CACHE_TTL)."""
+    with _user_cache_lock:
+        _user_cache.pop(str(user_id), None)
 
 
 def admin_required(f):
@@ -97,50 +214,176 @@ def _get_pid(cart_doc):
     return ObjectId(m.group(0)) if m else None
 
 
-def _normalize_cart(user_oid):
-    """Normalize current user's cart: unifies product_id field, merges duplicates, drops invalid items."""
-    items = list(db.carts.find({"userId": user_oid}))
+def _cart_fix_ops(items):
+    """Bulk ops that canonicalize one user's cart: unify product_id, merge duplicates, drop invalid items.
+
+    Deletes come first so the surviving doc can take the canonical product_id without hitting the unique index.
+    """
+    deletes, updates, groups = [], [], {}
     for it in items:
         pid = _get_pid(it)
         if not pid:
-            db.carts.delete_one({"_id": it["_id"]})
+            deletes.append(DeleteOne({"_id": it["_id"]}))
             continue
-        if it.get("product_id") != pid or any(k in it for k in ("productId", "pid")):
-            db.carts.update_one(
-                {"_id": it["_id"]},
-                {"$set": {"product_id": pid}, "$unset": {"productId": "", "pid": ""}},
-            )
-    # merge duplicates
-    groups = db.carts.aggregate(
-        [{"$match": {"userId": user_oid}}, {"$group": {"_id": "$product_id", "ids": {"$push": "$_id"}, "sumQty": {"$sum": "$qty"}}}]
-    )
-    for g in groups:
-        ids = g["ids"]
-        if len(ids) > 1:
-            keep = ids[0]
-            db.carts.update_one({"_id": keep}, {"$set": {"qty": g["sumQty"]}})
-            db.carts.delete_many({"_id": {"$in": ids[1:]}})
+        groups.setdefault(pid, []).append(it)
+    for pid, its in groups.items():
+        its.sort(key=lambda it: it.get("product_id") != pid)  # keep the canonical doc if there is one
+        keep, dups = its[0], its[1:]
+        if dups:
+            deletes.append(DeleteMany({"_id": {"$in": [d["_id"] for d in dups]}}))
+        if (dups or keep.get("product_id") != pid or "productId" in keep or "pid" in keep
+                or keep.get("schemaVersion") != CART_SCHEMA_VERSION):
+            updates.append(UpdateOne(
+                {"_id": keep["_id"]},
+                {
+                    "$set": {"product_id": pid, "qty": sum(it.get("qty", 0) for it in its),
+                             "schemaVersion": CART_SCHEMA_VERSION},
+                    "$unset": {"productId": "", "pid": ""},
+                },
+            ))
+    return deletes + updates
+
+
+def _normalize_cart(user_oid):
+    """Normalize current user's cart: unifies product_id field, merges duplicates, drops invalid items."""
+    ops = _cart_fix_ops(list(db.carts.find({"userId": user_oid})))
+    if ops:
+        db.carts.bulk_write(ops, ordered=True)
+
+
+def load_cart(user_oid):
+    """Cart items for a user; legacy (pre-schemaVersion) carts are normalized once on the way."""
+    items = list(db.carts.find({"userId": user_oid}))
+    if any(it.get("schemaVersion") != CART_SCHEMA_VERSION for it in items):
+        ops = _cart_fix_ops(items)
+        db.carts.bulk_write(ops, ordered=True)
+        items = list(db.carts.find({"userId": user_oid}))
+    return items
+
+
+def products_by_id(pids):
+    """Fetch all products for `pids` in one round-trip; returns {pid: product}."""
+    pids = list({p for p in pids if p})
+    if not pids:
+        return {}
+    return {p["_id"]: p for p in db.products.find({"_id": {"$in": pids}}, CART_FIELDS)}
 
 
 def build_path(parent, name):
     return f"{parent['path']}>{name}" if parent else name
 
 
-def get_all_descendant_ids(cat_id):
-    node = db.categories.find_one({"_id": cat_id})
-    if not node:
-        return {cat_id}
-    prefix = node["path"] + ">"
-    ids = {node["_id"]}
-    for c in db.categories.find({"path": {"$regex": f"^{re.escape(prefix)}"}}):
+def category_fields(cat_ids, tree):
+    """categoryIds (existing categories only) plus the denormalized categoryPaths shown on the detail page.
+
+    Pass a tree from category_cache.tree(fresh=True): a cached one may predate a category just
+    added on another worker, and its id would be dropped here.
+    """
+    ids = [c for c in cat_ids if c in tree.by_id]
+    return {"categoryIds": ids, "categoryPaths": [tree.by_id[c]["path"] for c in ids]}
+
+
+def category_name_error(name, parent, cat_id=None):
+    """Why `name` cannot be used under `parent` (by the category `cat_id`, when renaming), else None."""
+    if not name:
+        return "Category name is required"
+    if ">" in name:
+        return "Category names cannot contain '>' (it separates path levels)"
+    if db.categories.find_one({"path": build_path(parent, name), "_id": {"$ne": cat_id}}, {"_id": 1}):
+        return f"A category named {name} already exists there"
+    return None
+
+
+def build_ancestors(parent):
+    """Materialized ancestor ids (root first) for a child of `parent`."""
+    return (parent.get("ancestors") or []) + [parent["_id"]] if parent else []
+
+
+def get_all_descendant_ids(cat_ids):
+    """The given categories plus all their descendants, via one query on the indexed `ancestors` array."""
+    cat_ids = list(cat_ids)
+    if not cat_ids:
+        return set()
+    ids = set(cat_ids)
+    for c in db.categories.find({"ancestors": {"$in": cat_ids}}, {"_id": 1}):
         ids.add(c["_id"])
     return ids
 
 
-def first_image_url(p):
+EPOCH = datetime(1970, 1, 1)
+
+
+def encode_cursor(doc):
+    """Continuation token for keyset paging: '<createdAt epoch ms>-<_id hex>'."""
+    ms = (doc["createdAt"] - EPOCH) // timedelta(milliseconds=1)
+    return f"{ms}-{doc['_id']}"
+
+
+def decode_cursor(token):
+    m = re.fullmatch(r"(-?\d+)-([0-9a-fA-F]{24})", token or "")
+    if not m:
+        return None
+    return EPOCH + timedelta(milliseconds=int(m.group(1))), ObjectId(m.group(2))
+
+
+def page_arg():
+    try:
+        return max(1, int(request.args.get("page") or 1))
+    except ValueError:
+        return 1
+
+
+def page_size_arg():
+    try:
+        size = int(request.args.get("size") or PAGE_SIZE)
+    except ValueError:
+        size = PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_page(coll, query, size, after=None, before=None, projection=None):
+    """One page of `query` ordered by (createdAt, _id) desc, using the (status, createdAt, _id) index.
+
+    `after` continues towards older documents, `before` goes back towards newer ones.
+    Returns (docs, next_cursor, prev_cursor); a cursor is None when there is no such page.
+    """
+    q, sort, pos, backwards = keyset_find_args(query, after, before)
+    docs = list(coll.find(q, projection).sort(sort).limit(size + 1))
+    return keyset_result(docs, size, pos, backwards)
+
+
+def keyset_find_args(query, after=None, before=None):
+    """(filter, sort, position, backwards) for fetching size + 1 docs of a keyset page."""
+    back = decode_cursor(before)
+    pos = back or decode_cursor(after)
+    backwards = back is not None
+    q = dict(query)
+    if pos:
+        op = "$gt" if backwards else "$lt"
+        ts, last_id = pos
+        q["$or"] = [{"createdAt": {op: ts}}, {"createdAt": ts, "_id": {op: last_id}}]
+    order = ASCENDING if backwards else DESCENDING
+    return q, [("createdAt", order), ("_id", order)], pos, backwards
+
+
+def keyset_result(docs, size, pos, backwards):
+    """Trim the size + 1 fetched docs to a page; returns (docs, next_cursor, prev_cursor)."""
+    more = len(docs) > size
+    docs = docs[:size]
+    if backwards:
+        docs.reverse()
+        has_next, has_prev = True, more
+    else:
+        has_next, has_prev = more, pos is not None
+    next_cursor = encode_cursor(docs[-1]) if docs and has_next else None
+    prev_cursor = encode_cursor(docs[0]) if docs and has_prev else None
+    return docs, next_cursor, prev_cursor
+
+
+def first_image_url(p, size=None):
     ids = p.get("imageIds") or []
     if ids:
-        return url_for("image_file", file_id=str(ids[0]))
+        return url_for("image_file", file_id=str(ids[0]), size=size)
     paths = p.get("images") or []
     if paths:
         return paths[0]
@@ -199,6 +442,7 @@ def login():
             flash("Password does not match", "error")
             return redirect(url_for("login"))
 
+        forget_user(u["_id"])
         login_user(User(u))
         next_url = request.args.get("next")
         return redirect(next_url or url_for("index"))
@@ -208,61 +452,195 @@ def login():
 @app.route("/logout")
 @login_required
 def logout():
+    forget_user(current_user.id)
     logout_user()
     flash("Signed out", "success")
     return redirect(url_for("index"))
 
 
 # --------------- image serving (GridFS) ---------------
+def gridout_meta(gridout):
+    return {
+        "content_type": getattr(gridout, "content_type", None) or "application/octet-stream",
+        "length": gridout.length,
+        "etag": getattr(gridout, "md5", None) or f"{gridout._id}-{gridout.length}",
+        "modified": int(gridout.upload_date.replace(tzinfo=timezone.utc).timestamp()),
+    }
+
+
+def image_headers(meta):
+    return {
+        "ETag": f'"{meta["etag"]}"',
+        "Last-Modified": http_date(meta["modified"]),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=86400",
+    }
+
+
+def image_not_modified(meta):
+    if request.if_none_match:
+        return request.if_none_match.contains(meta["etag"])
+    since = request.if_modified_since
+    return bool(since) and since.timestamp() >= meta["modified"]
+
+
+def image_cache_key(fid, size=None):
+    return f"{fid}_{size}" if size else str(fid)
+
+
+def store_image(data, filename, content_type, pid):
+    """Put an uploaded image and its resized variants into GridFS; returns the original's id.
+
+    The original's fs.files doc carries {"variants": {name: variant file id}}.
+    """
+    fid = ObjectId()
+    variants = put_variants(fid, data, filename, pid)
+    fs.put(data, _id=fid, filename=filename, content_type=content_type, productId=pid, variants=variants)
+    return fid
+
+
+def put_variants(fid, data, filename, pid):
+    variants = {}
+    for name, (vdata, vtype) in make_variants(data).items():
+        variants[name] = fs.put(vdata, filename=f"{name}_{filename}", content_type=vtype,
+                                productId=pid, variantOf=fid, variant=name)
+    return variants
+
+
+def delete_stored_image(fid):
+    """Delete an image, its variants and every cached copy of them."""
+    doc = db.fs.files.find_one({"_id": fid}, {"variants": 1}) or {}
+    for vid in [*(doc.get("variants") or {}).values(), fid]:
+        try:
+            fs.delete(vid)
+        except Exception:
+            pass
+    for size in [None, *IMAGE_VARIANTS]:
+        image_cache.discard(image_cache_key(fid, size))
+
+
 @app.route("/image/<file_id>")
 def image_file(file_id):
     fid = oid(file_id)
     if not fid:
         return Response(status=404)
-    try:
-        gridout = fs.get(fid)
-    except Exception:
-        return Response(status=404)
-    data = gridout.read()
-    ctype = getattr(gridout, "content_type", None) or "application/octet-stream"
-    return Response(data, mimetype=ctype)
+    size = request.args.get("size")
+    size = size if size in IMAGE_VARIANTS else None
+    key = image_cache_key(fid, size)
+    gridout, data = None, None
+    cached = image_cache.get(key)
+    if cached:
+        meta, data = cached
+    else:
+        try:
+            gridout = fs.get(fid)  # only the fs.files doc; chunks are read lazily
+            vid = (getattr(gridout, "variants", None) or {}).get(size)
+            if vid:
+                gridout = fs.get(vid)
+        except Exception:
+            return Response(status=404)
+        meta = gridout_meta(gridout)
+
+    headers = image_headers(meta)
+    if image_not_modified(meta):
+        return Response(status=304, headers=headers)
+
+    if gridout is not None and meta["length"] <= image_cache.max_item_bytes:
+        data = gridout.read()
+        image_cache.put(key, meta, data)
+
+    length = meta["length"]
+    start, stop, status = 0, length, 200
+    rng, if_range = request.range, request.if_range
+    if if_range.etag:
+        rng = rng if if_range.etag == meta["etag"] else None
+    elif if_range.date:
+        rng = rng if if_range.date.timestamp() >= meta["modified"] else None
+    if rng:
+        bounds = rng.range_for_length(length)
+        if bounds is None:
+            headers["Content-Range"] = f"bytes */{length}"
+            return Response(status=416, headers=headers)
+        start, stop = bounds
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{length}"
+    headers["Content-Length"] = str(stop - start)
+    if request.method == "HEAD":
+        return Response(status=status, mimetype=meta["content_type"], headers=headers)
+    body = data[start:stop] if data is not None else stream_gridout(gridout, start, stop)
+    return Response(body, status=status, mimetype=meta["content_type"], headers=headers, direct_passthrough=True)
+
+
+def stream_gridout(gridout, start, stop):
+    """Yield bytes [start, stop) of a GridFS file one chunk at a time."""
+    gridout.seek(start)
+    remaining = stop - start
+    while remaining > 0:
+        chunk = gridout.readchunk()
+        if not chunk:
+            break
+        chunk = chunk[:remaining]
+        remaining -= len(chunk)
+        yield chunk
+    gridout.close()
+
+
+@app.route("/admin/cache-stats")
+@login_required
+@admin_required
+def cache_stats():
+    return {"images": image_cache.snapshot(), "pages": dict(page_cache.stats)}
 
 
 # --------------- home & product detail ---------------
 @app.route("/")
+@page_cache.cached
 def index():
-    products = list(db.products.find({"status": "active"}).sort("createdAt", -1))
+    size = page_size_arg()
+    products, next_cursor, prev_cursor = keyset_page(
+        db.products, {"status": "active"}, size,
+        after=request.args.get("after"), before=request.args.get("before"), projection=LISTING_FIELDS,
+    )
+    return render_index(products, next_cursor, prev_cursor, size)
+
+
+def render_index(products, next_cursor, prev_cursor, size):
     for p in products:
         p["_id"] = str(p["_id"])
-        p["img0"] = first_image_url(p)
-    return render_template("index.html", products=products)
+        p["img0"] = first_image_url(p, "thumb")
+    return render_template(
+        "index.html", products=products, next_cursor=next_cursor, prev_cursor=prev_cursor,
+        size=size if size != PAGE_SIZE else None,
+    )
 
 
 @app.route("/products/view/<product_id>")
+@page_cache.cached
 def product_detail(product_id):
     pid = oid(product_id)
     if not pid:
         flash("Invalid product ID", "error")
         return redirect(url_for("index"))
-    p = db.products.find_one({"_id": pid})
+    p = db.products.find_one({"_id": pid}, DETAIL_FIELDS)
 
     if not p:
         flash("Product not found", "error")
         return redirect(url_for("index"))
 
+    cat_names = p.get("categoryPaths")
+    if cat_names is None:  # not yet backfilled by sync-product-categories
+        cat_names = [c["path"] for c in db.categories.find({"_id": {"$in": p.get("categoryIds") or []}})]
+    return render_product_detail(p, cat_names)
+
+
+def render_product_detail(p, cat_names):
     old_extra = p['extra_attrs'] if 'extra_attrs' in p else None
 
     img_ids = [str(x) for x in (p.get("imageIds") or [])]
-    imgs = [url_for("image_file", file_id=i) for i in img_ids]
+    imgs = [url_for("image_file", file_id=i, size="detail") for i in img_ids]
     if (not imgs) and p.get("images"):
         imgs = p["images"]
 
-    cat_names = []
-    ids = p.get("categoryIds", [])
-    if ids:
-        for c in db.categories.find({"_id": {"$in": ids}}):
-            cat_names.append(c["path"])
-
     p["_id"] = str(p["_id"])
 
     extra_attrs={}
@@ -280,14 +658,11 @@ def product_detail(product_id):
 @app.route("/cart")
 @login_required
 def cart():
-    _normalize_cart(ObjectId(current_user.id))
-    items = list(db.carts.find({"userId": ObjectId(current_user.id)}))
+    items = load_cart(ObjectId(current_user.id))
+    prods = products_by_id(_get_pid(it) for it in items)
     valid, total = [], 0.0
     for it in items:
-        pid = _get_pid(it)
-        if not pid:
-            continue
-        prod = db.products.find_one({"_id": pid})
+        prod = prods.get(_get_pid(it))
         if not prod:
             continue
         it["product"] = prod
@@ -301,7 +676,7 @@ def cart():
 def add_to_cart():
     pid = oid(request.form.get("product_id"))
     qty = int(request.form.get("qty", 1) or 1)
-    p = db.products.find_one({"_id": pid, "status": "active"})
+    p = db.products.find_one({"_id": pid, "status": "active"}, {"stock": 1})
     if not p or int(p.get("stock", 0)) <= 0:
         flash("Product is unavailable or out of stock", "error")
         return redirect(url_for("product_detail", product_id=request.form.get("product_id")))
@@ -318,7 +693,9 @@ def add_to_cart():
             return redirect(url_for("product_detail", product_id=request.form.get("product_id")))
         db.carts.update_one({"_id": existing["_id"]}, {"$set": {"qty": new_qty}})
     else:
-        db.carts.insert_one({"userId": ObjectId(current_user.id), "product_id": pid, "qty": qty})
+        db.carts.insert_one(
+            {"userId": ObjectId(current_user.id), "product_id": pid, "qty": qty, "schemaVersion": CART_SCHEMA_VERSION}
+        )
 
     flash("Added to cart", "success")
     return redirect(url_for("cart"))
@@ -328,100 +705,248 @@ def add_to_cart():
 @app.route("/cart/item/remove", methods=["POST"])
 @login_required
 def cart_item_remove():
-    _normalize_cart(ObjectId(current_user.id))
     pid = oid(request.form.get("product_id"))
     if not pid:
         flash("Invalid item.", "error")
         return redirect(request.referrer or url_for("cart"))
-    db.carts.delete_one({"userId": ObjectId(current_user.id), "product_id": pid})
+    if not db.carts.delete_one({"userId": ObjectId(current_user.id), "product_id": pid}).deleted_count:
+        # may still be stored under a legacy field name
+        _normalize_cart(ObjectId(current_user.id))
+        db.carts.delete_one({"userId": ObjectId(current_user.id), "product_id": pid})
     flash("Item removed", "success")
     return redirect(request.referrer or url_for("cart"))
 
 @app.route("/checkout", methods=["GET", "POST"])
 @login_required
 def checkout():
-    _normalize_cart(ObjectId(current_user.id))
-    items = list(db.carts.find({"userId": ObjectId(current_user.id)}))
+    items = load_cart(ObjectId(current_user.id))
     if not items:
         flash("Cart is empty", "info")
         return redirect(url_for("cart"))
 
+    prods = products_by_id(_get_pid(it) for it in items)
     for it in items:
         pid = _get_pid(it)
         if not pid:
             flash("Cart contains invalid item.", "error")
             return redirect(url_for("cart"))
-        p = db.products.find_one({"_id": pid, "status": "active"})
-        if (not p) or int(p.get("stock", 0)) < it.get("qty", 0):
+        p = prods.get(pid)
+        if (not p) or p.get("status") != "active" or int(p.get("stock", 0)) < it.get("qty", 0):
             flash("Some items are out of stock. Please update your cart.", "error")
             return redirect(url_for("cart"))
 
     if request.method == "POST":
         total, lines = 0.0, []
         for it in items:
-            pid = _get_pid(it)
-            prod = db.products.find_one({"_id": pid})
+            prod = prods[_get_pid(it)]
             total += prod["price"] * it["qty"]
             lines.append(
                 {"product_id": prod["_id"], "title": prod["title"], "price": prod["price"], "qty": it["qty"]}
             )
 
-        order_id = db.orders.insert_one(
-            {
-                "userId": ObjectId(current_user.id),
-                "lines": lines,
-                "total": total,
-                "status": "paid",
-                "createdAt": datetime.utcnow(),
-            }
-        ).inserted_id
-
-        for it in items:
-            pid = _get_pid(it)
-            db.products.update_one({"_id": pid}, {"$inc": {"stock": -it["qty"]}})
-
-        db.carts.delete_many({"userId": ObjectId(current_user.id)})
+        try:
+            order_id = place_order(ObjectId(current_user.id), lines, total)
+        except OutOfStock as e:
+            for f in e.failures:
+                flash(f"{f['title']}: only {f['available']} left (you asked for {f['requested']}).", "error")
+            if not e.failures:  # stock changed again between the failed attempt and the re-read
+                flash("Stock changed while placing your order. Please review your cart and try again.", "error")
+            return redirect(url_for("cart"))
         return render_template("checkout.html", order_id=str(order_id), total=total)
 
     total = 0.0
     for it in items:
-        pid = _get_pid(it)
-        prod = db.products.find_one({"_id": pid})
-        if not prod:
-            continue
+        prod = prods[_get_pid(it)]
         it["product"] = prod
         total += prod["price"] * it["qty"]
     return render_template("checkout.html", items=items, total=total)
 
 
+class OutOfStock(Exception):
+    def __init__(self, failures):
+        super().__init__("insufficient stock")
+        self.failures = failures
+
+
+_txn_supported = None
+
+
+def supports_transactions():
+    """Transactions need a replica set (a single-node one is enough) or mongos."""
+    global _txn_supported
+    if _txn_supported is None:
+        try:
+            hello = client.admin.command("ismaster")
+            _txn_supported = bool(hello.get("setName") or hello.get("msg") == "isdbgrid")
+        except Exception:
+            _txn_supported = False
+    return _txn_supported
+
+
+def _stock_failures(lines):
+    """Lines the committed stock cannot cover; only call once no decrement of this order is in effect."""
+    stock = {p["_id"]: p.get("stock", 0) for p in db.products.find(
+        {"_id": {"$in": [l["product_id"] for l in lines]}}, {"stock": 1})}
+    return [
+        {"product_id": l["product_id"], "title": l["title"], "requested": l["qty"], "available": stock.get(l["product_id"], 0)}
+        for l in lines if stock.get(l["product_id"], 0) < l["qty"]
+    ]
+
+
+def place_order(user_oid, lines, total):
+    """Decrement stock, insert the order and clear the cart as one unit; returns the order id.
+
+    Stock is only taken where {stock: {$gte: qty}} still holds. If any line falls short nothing is
+    written and OutOfStock carries the per-line failures. On a replica set this runs in a transaction
+    (with_transaction retries transient errors); on a standalone server decrements are undone by hand.
+    """
+    order = {"userId": user_oid, "lines": lines, "total": total, "status": "paid", "createdAt": datetime.utcnow()}
+    decrements = [
+        UpdateOne({"_id": l["product_id"], "stock": {"$gte": l["qty"]}}, {"$inc": {"stock": -l["qty"]}})
+        for l in lines
+    ]
+
+    if supports_transactions():
+        def txn(session):
+            res = db.products.bulk_write(decrements, ordered=False, session=session)
+            if res.matched_count != len(decrements):
+                # reads in here would see this transaction's own decrements; report after the abort
+                raise OutOfStock(None)
+            order_id = db.orders.insert_one(dict(order), session=session).inserted_id
+            db.carts.delete_many({"userId": user_oid}, session=session)
+            return order_id
+
+        with client.start_session() as session:
+            try:
+                return session.with_transaction(
+                    txn, read_concern=ReadConcern("snapshot"), write_concern=WriteConcern("majority")
+                )
+            except OutOfStock:
+                pass  # with_transaction aborted, so none of the decrements took effect
+        raise OutOfStock(_stock_failures(lines))
+
+    taken = []
+    for l in lines:
+        res = db.products.update_one(
+            {"_id": l["product_id"], "stock": {"$gte": l["qty"]}}, {"$inc": {"stock": -l["qty"]}}
+        )
+        if not res.modified_count:
+            for t in taken:
+                db.products.update_one({"_id": t["product_id"]}, {"$inc": {"stock": t["qty"]}})
+            raise OutOfStock(_stock_failures(lines))
+        taken.append(l)
+    order_id = db.orders.insert_one(order).inserted_id
+    db.carts.delete_many({"userId": user_oid})
+    return order_id
+
+
 # --------------- categories ---------------
 @app.route("/categories", methods=["GET"])
 @login_required
 def categories_home():
+    tree = category_cache.tree()
+    keyword, selected, query = category_search_args(tree)
+    products, page, size, has_next = [], page_arg(), page_size_arg(), False
+    if query is not None:
+        products, has_next = search_products(query, keyword, page, size)
+    return render_categories(tree, products, keyword, selected, page, size, has_next)
+
+
+def category_search_args(tree):
+    """(keyword, selected category ids as given, product filter or None when nothing was searched)."""
     keyword = (request.args.get("q") or "").strip()
     selected = request.args.getlist("cat")
-    cat_docs = list(db.categories.find({}).sort("path", 1))
-
-    products = []
-    if selected or keyword:
-        selected_ids = set()
-        for sid in selected:
-            cid = oid(sid)
-            if cid:
-                selected_ids |= get_all_descendant_ids(cid)
-        query = {"status": "active"}
-        if selected_ids:
-            query["categoryIds"] = {"$in": list(selected_ids)}
-        if keyword:
-            query["$or"] = [
-                {"title": {"$regex": keyword, "$options": "i"}},
-                {"sku": {"$regex": keyword, "$options": "i"}},
-            ]
-        products = list(db.products.find(query))
-        for p in products:
-            p["img0"] = first_image_url(p)
-
-    return render_template("categories.html", categories=cat_docs, products=products, q=keyword, selected=selected)
+    if not (selected or keyword):
+        return keyword, selected, None
+    selected_ids = tree.descendant_ids(x for x in map(oid, selected) if x)
+    query = {"status": "active"}
+    if selected_ids:
+        query["categoryIds"] = {"$in": list(selected_ids)}
+    return keyword, selected, query
+
+
+def render_categories(tree, products, keyword, selected, page, size, has_next):
+    for p in products:
+        p["img0"] = first_image_url(p, "thumb")
+    return render_template(
+        "categories.html", categories=tree.nodes, products=products, q=keyword, selected=selected,
+        page=page, has_next=has_next, size=size if size != PAGE_SIZE else None,
+    )
+
+
+def search_products(query, keyword, page, size):
+    """One page of products matching `query` and `keyword`; returns (products, has_next).
+
+    Keywords of MIN_TEXT_QUERY chars or more use the title text index ranked by textScore, with
+    SKU prefix matches (served by the sku index) listed first. Shorter keywords fall back to a
+    case-insensitive regex; no keyword lists newest first.
+
+    With SKU matches the result is their list followed by the text matches (which exclude them),
+    paged as one: the main query skips only what earlier pages did not fill with SKU matches.
+    Without the text index (ensure-indexes not run yet) text keywords use the regex path too.
+    """
+    try:
+        return _search_page(query, keyword, page, size, text=True)
+    except OperationFailure as e:
+        if not text_index_missing(e):
+            raise
+        return _search_page(query, keyword, page, size, text=False)
+
+
+TEXT_INDEX_NOT_FOUND = 27  # IndexNotFound: "text index required for $text query"
+
+
+def text_index_missing(e):
+    if e.code != TEXT_INDEX_NOT_FOUND:
+        return False
+    app.logger.warning("products has no text index (run ensure-indexes); searching with a regex instead")
+    return True
+
+
+def _search_page(query, keyword, page, size, text):
+    q, projection, sort = search_find_args(query, keyword, text)
+    offset, sku_hits, sku_total = (page - 1) * size, [], 0
+    sku_q = sku_prefix_query(query, keyword, text)
+    if sku_q:
+        sku_hits = list(db.products.find(sku_q, LISTING_FIELDS).sort("sku", ASCENDING).skip(offset).limit(size + 1))
+        if len(sku_hits) > size:
+            return sku_hits[:size], True
+        sku_total = offset + len(sku_hits) if sku_hits or page == 1 else db.products.count_documents(sku_q)
+    docs = list(db.products.find(q, projection).sort(sort)
+                .skip(max(0, offset - sku_total)).limit(size - len(sku_hits) + 1))
+    return merge_search_results(docs, sku_hits, size)
+
+
+def search_find_args(query, keyword, text=True):
+    """(filter, projection, sort) of the main search query; text=False forces the regex path."""
+    if not keyword:
+        return query, LISTING_FIELDS, [("createdAt", DESCENDING), ("_id", DESCENDING)]
+    if not text or len(keyword) < MIN_TEXT_QUERY:
+        q = dict(query, **{"$or": [
+            {"title": {"$regex": re.escape(keyword), "$options": "i"}},
+            {"sku": {"$regex": re.escape(keyword), "$options": "i"}},
+        ]})
+        return q, LISTING_FIELDS, [("createdAt", DESCENDING), ("_id", DESCENDING)]
+    q = dict(query, **{"$text": {"$search": keyword}}, sku={"$nin": _sku_prefixes(keyword)})  # listed via sku_prefix_query
+    return q, dict(LISTING_FIELDS, score={"$meta": "textScore"}), [("score", {"$meta": "textScore"})]
+
+
+def _sku_prefixes(keyword):
+    prefix = re.escape(keyword)
+    return [re.compile(f"^{prefix}"), re.compile(f"^{prefix.upper()}")]
+
+
+def sku_prefix_query(query, keyword, text=True):
+    """Filter for the SKU prefix matches listed ahead of a text search's results, else None."""
+    if not text or not keyword or len(keyword) < MIN_TEXT_QUERY:
+        return None
+    return dict(query, sku={"$in": _sku_prefixes(keyword)})
+
+
+def merge_search_results(docs, sku_hits, size):
+    """This page's SKU hits, then main results (fetched one past the page); returns (products, has_next)."""
+    products = sku_hits + docs
+    return products[:size], len(products) > size
 
 
 # --------------- admin: products ---------------
@@ -429,15 +954,43 @@ def categories_home():
 @login_required
 @admin_required
 def admin_products():
-    products = list(db.products.find({}).sort("createdAt", -1))
+    products = list(db.products.find({}, ADMIN_TABLE_FIELDS).sort("createdAt", -1))
     return render_template("admin_products.html", products=products)
 
 
+def upsert_product(fields, unset=()):
+    """Create the product with fields["sku"] or overwrite the existing one; returns (_id, created).
+
+    Safe to repeat (a re-posted form or feed just updates) and, with the unique sku index, to run
+    concurrently: the losing side of an insert race gets DuplicateKeyError and retries as an update.
+    """
+    new_id = ObjectId()
+    update = {
+        "$set": fields,
+        "$setOnInsert": {"_id": new_id, "createdAt": datetime.utcnow(), "imageIds": [], "images": []},
+    }
+    unset = [k for k in unset if k not in fields]
+    if unset:
+        update["$unset"] = {k: "" for k in unset}
+
+    def attempt():
+        return db.products.find_one_and_update(
+            {"sku": fields["sku"]}, update, projection={"_id": 1}, upsert=True,
+            return_document=ReturnDocument.BEFORE,
+        )
+
+    try:
+        before = attempt()
+    except DuplicateKeyError:
+        before = attempt()  # the racing insert has committed, so this matches it; a second error propagates
+    return (before["_id"], False) if before else (new_id, True)
+
+
 @app.route("/admin/products/add", methods=["GET", "POST"])
 @login_required
 @admin_required
 def admin_add_product():
-    cats = list(db.categories.find({}).sort("path", 1))
+    cats = category_cache.tree().nodes
     if request.method == "POST":
 
         new_keys=request.form.getlist("attr_name[]")
@@ -464,29 +1017,68 @@ def admin_add_product():
             extra_attr[key]=value
 
 
+        if not sku:
+            flash("SKU is required", "error")
+            return redirect(url_for("admin_add_product"))
+
         fixed_dict={
                 "title": title,
                 "price": price,
                 "sku": sku,
-                "categoryIds": selected,
-                "imageIds": [],
-                "images": [],  # legacy
-                "createdAt": datetime.utcnow(),
+                **category_fields(selected, category_cache.tree(fresh=True)),
                 "status": status,
                 "stock": stock,
         }
         if extra_attr:
             fixed_dict['extra_attrs']=extra_attr
         # final_dict=fixed_dict | extra_attr
-        print(fixed_dict)
 
-        # new_id = db.products.insert_one(final_dict).inserted_id
-        new_id = db.products.insert_one(fixed_dict).inserted_id
-        flash("Product created", "success")
+        # an existing product with this sku is updated in place (images and createdAt are kept)
+        new_id, created = upsert_product(fixed_dict, unset=("extra_attrs",))
+        page_cache.invalidate()
+        flash("Product created" if created else f"Updated the existing product with SKU {sku}", "success")
         return redirect(url_for("admin_edit_product", product_id=str(new_id)))
     return render_template("admin_add_product.html", categories=cats)
 
 
+IMPORT_FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+@app.route("/admin/products/import", methods=["GET", "POST"])
+@login_required
+@admin_required
+def admin_import_products():
+    """Bulk upsert by sku from an uploaded CSV/JSONL file (parsed row by row, written in batches)."""
+    result = None
+    if request.method == "POST":
+        f = request.files.get("file")
+        fmt = request.form.get("format") or (f.filename.rsplit(".", 1)[-1].lower() if f and "." in f.filename else "")
+        if not f or not f.filename:
+            flash("Choose a file to import", "error")
+            return redirect(url_for("admin_import_products"))
+        if fmt not in IMPORT_FORMATS:
+            flash("Unknown format: use a .csv or .jsonl file", "error")
+            return redirect(url_for("admin_import_products"))
+        stream = io.TextIOWrapper(f.stream, encoding="utf-8-sig", newline="")
+        result = import_products(db, read_rows(stream, fmt), category_cache.tree(fresh=True), JOB_BATCH_SIZE,
+                                 dry_run=bool(request.form.get("dry_run")))
+        if result["inserted"] or result["updated"]:
+            page_cache.invalidate()
+    return render_template("admin_products_import.html", result=result)
+
+
+@app.route("/admin/products/export.<fmt>")
+@login_required
+@admin_required
+def admin_export_products(fmt):
+    if fmt not in IMPORT_FORMATS:
+        return Response(status=404)
+    return Response(
+        stream_with_context(export_products(db, fmt)), mimetype=IMPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=products.{fmt}"},
+    )
+
+
 @app.route("/admin/products/edit/<product_id>", methods=["GET", "POST"])
 @login_required
 @admin_required
@@ -505,7 +1097,7 @@ def admin_edit_product(product_id):
     #         continue
     #     old_extra[key]=''
 
-    cats = list(db.categories.find({}).sort("path", 1))
+    cats = category_cache.tree().nodes
     if request.method == "POST":
         title = request.form["title"].strip()
         price = float(request.form["price"])
@@ -515,12 +1107,9 @@ def admin_edit_product(product_id):
         selected = [oid(x) for x in request.form.getlist("categories")]
         selected = [x for x in selected if x]
 
-        if 'extra_attrs' in p:
-            db.products.update_one(
-                {"_id": pid},
-                {"$unset": {'extra_attrs':''}}
-            )
-
+        if not sku:
+            flash("SKU is required", "error")
+            return redirect(url_for("admin_edit_product", product_id=product_id))
 
         new_keys=request.form.getlist("attr_name[]")
         new_values=request.form.getlist("attr_value[]")
@@ -537,18 +1126,21 @@ def admin_edit_product(product_id):
                     "title": title,
                     "price": price,
                     "sku": sku,
-                    "categoryIds": selected,
+                    **category_fields(selected, category_cache.tree(fresh=True)),
                     "status": status,
                     "stock": stock,
                 }
+        update = {"$set": fixed_dict}
         if extra_attr:
             fixed_dict['extra_attrs']=extra_attr
-        db.products.update_one(
-            {"_id": pid},
-            {
-                "$set": fixed_dict
-            },
-        )
+        elif 'extra_attrs' in p:
+            update["$unset"] = {'extra_attrs': ''}
+        try:
+            db.products.update_one({"_id": pid}, update)
+        except DuplicateKeyError:
+            flash(f"Another product already has SKU {sku}", "error")
+            return redirect(url_for("admin_edit_product", product_id=product_id))
+        page_cache.invalidate()
 
         flash("Product updated", "success")
         return redirect(url_for("admin_edit_product", product_id=product_id))
@@ -563,7 +1155,7 @@ def admin_edit_product(product_id):
         extra_attrs=old_extra.copy()
 
     img_ids = [str(x) for x in (p.get("imageIds") or [])]
-    img_pairs = [{"id": i, "url": url_for("image_file", file_id=i)} for i in img_ids]
+    img_pairs = [{"id": i, "url": url_for("image_file", file_id=i, size="listing")} for i in img_ids]
     print(extra_attrs)
     return render_template("admin_edit_product.html", p=p, categories=cats, img_pairs=img_pairs,extra_attrs=extra_attrs)
 
@@ -573,13 +1165,11 @@ def admin_edit_product(product_id):
 @admin_required
 def admin_delete_product(product_id):
     pid = oid(product_id)
-    prod = db.products.find_one({"_id": pid}) or {}
+    prod = db.products.find_one({"_id": pid}, {"imageIds": 1}) or {}
     for fid in prod.get("imageIds", []):
-        try:
-            fs.delete(fid)
-        except Exception:
-            pass
+        delete_stored_image(fid)
     db.products.delete_one({"_id": pid})
+    page_cache.invalidate()
     flash("Product deleted", "success")
     return redirect(url_for("admin_products"))
 
@@ -594,11 +1184,11 @@ def upload_images(product_id):
     for f in files:
         if not f.filename:
             continue
-        data = f.read()
-        fid = fs.put(data, filename=f.filename, content_type=f.mimetype, productId=pid)
+        fid = store_image(f.read(), f.filename, f.mimetype, pid)
         ids.append(fid)
     if ids:
         db.products.update_one({"_id": pid}, {"$push": {"imageIds": {"$each": ids}}})
+        page_cache.invalidate()
         flash(f"Uploaded {len(ids)} images", "success")
     else:
         flash("No file selected", "info")
@@ -614,11 +1204,9 @@ def delete_image(product_id):
     if not fid:
         flash("Invalid image id", "error")
         return redirect(url_for("admin_edit_product", product_id=product_id))
-    try:
-        fs.delete(fid)
-    except Exception:
-        pass
+    delete_stored_image(fid)
     db.products.update_one({"_id": pid}, {"$pull": {"imageIds": fid}})
+    page_cache.invalidate()
     flash("Image deleted", "success")
     return redirect(url_for("admin_edit_product", product_id=product_id))
 
@@ -628,10 +1216,11 @@ def delete_image(product_id):
 @login_required
 @admin_required
 def admin_categories():
-    nodes = list(db.categories.find({}).sort("path", 1))
-    id2name = {str(n["_id"]): n.get("name") for n in nodes}
-    for n in nodes:
-        n["parentName"] = id2name.get(str(n.get("parentId")), "Root") if n.get("parentId") else "Root"
+    tree = category_cache.tree()
+    nodes = []
+    for n in tree.nodes:
+        parent = tree.by_id.get(n.get("parentId"))
+        nodes.append(dict(n, parentName=parent.get("name") if parent else "Root"))
     return render_template("admin_categories.html", nodes=nodes)
 
 
@@ -643,14 +1232,56 @@ def admin_category_add():
         name = request.form["name"].strip()
         parent_id_str = request.form.get("parentId", "").strip()
         parent = db.categories.find_one({"_id": ObjectId(parent_id_str)}) if parent_id_str else None
+        error = category_name_error(name, parent)
+        if error:
+            flash(error, "error")
+            return redirect(url_for("admin_category_add"))
         path = build_path(parent, name)
         db.categories.insert_one(
-            {"name": name, "parentId": parent["_id"] if parent else None, "path": path, "createdAt": datetime.utcnow()}
+            {
+                "name": name,
+                "parentId": parent["_id"] if parent else None,
+                "path": path,
+                "ancestors": build_ancestors(parent),
+                "createdAt": datetime.utcnow(),
+            }
         )
+        category_cache.bump()
+        page_cache.invalidate()
         flash("Category created", "success")
         return redirect(url_for("admin_categories"))
-    nodes = list(db.categories.find({}).sort("path", 1))
-    return render_template("admin_category_add.html", nodes=nodes)
+    return render_template("admin_category_add.html", nodes=category_cache.tree().nodes)
+
+
+@app.route("/admin/categories/edit/<cat_id>", methods=["GET", "POST"])
+@login_required
+@admin_required
+def admin_category_edit(cat_id):
+    cid = oid(cat_id)
+    c = db.categories.find_one({"_id": cid})
+    if not c:
+        flash("Category not found", "error")
+        return redirect(url_for("admin_categories"))
+    if request.method == "POST":
+        name = request.form["name"].strip()
+        parent = db.categories.find_one({"_id": c["parentId"]}) if c.get("parentId") else None
+        error = category_name_error(name, parent, cid)
+        if error:
+            flash(error, "error")
+            return redirect(url_for("admin_category_edit", cat_id=cat_id))
+        old_path, new_path = c["path"], build_path(parent, name)
+        ops = [UpdateOne({"_id": cid}, {"$set": {"name": name, "path": new_path}})]
+        affected = [cid]
+        for d in db.categories.find({"ancestors": cid}, {"path": 1}):
+            ops.append(UpdateOne({"_id": d["_id"]}, {"$set": {"path": new_path + d["path"][len(old_path):]}}))
+            affected.append(d["_id"])
+        db.categories.bulk_write(ops, ordered=False)
+        category_cache.bump()
+        page_cache.invalidate()
+        jobs.submit("sync_product_categories", cat_ids=affected)
+        flash("Category renamed. Product category paths are being updated in the background.", "success")
+        return redirect(url_for("admin_categories"))
+    return render_template("categories_edit.html", cat=c)
 
 
 @app.route("/admin/categories/delete/<cat_id>")
@@ -662,14 +1293,72 @@ def admin_category_delete(cat_id):
     if not c:
         flash("Category not found", "error")
         return redirect(url_for("admin_categories"))
-    prefix = c["path"] + ">"
-    to_delete = [c["_id"]] + [d["_id"] for d in db.categories.find({"path": {"$regex": f"^{re.escape(prefix)}"}})]
+    to_delete = list(get_all_descendant_ids([c["_id"]]))
     db.categories.delete_many({"_id": {"$in": to_delete}})
-    db.products.update_many({}, {"$pull": {"categoryIds": {"$in": to_delete}}})
-    flash("Category and descendants deleted. Product refs updated.", "success")
+    category_cache.bump()
+    page_cache.invalidate()
+    jobs.submit("sync_product_categories", cat_ids=to_delete)
+    flash("Category and descendants deleted. Product refs are being updated in the background.", "success")
     return redirect(url_for("admin_categories"))
 
 
+# --------------- background jobs ---------------
+@jobs.handler("sync_product_categories")
+def sync_product_categories(job_id, cat_ids=None):
+    """Recompute categoryIds/categoryPaths of products filed under `cat_ids` (all products if None).
+
+    Only products matching the categoryIds index are touched, JOB_BATCH_SIZE at a time with a
+    JOB_BATCH_PAUSE sleep between batches so a big fan-out does not saturate the primary.
+    """
+    tree = category_cache.tree(fresh=True)
+    query = {"categoryIds": {"$in": cat_ids}} if cat_ids is not None else {}
+    jobs.progress(job_id, 0, db.products.count_documents(query))
+    done, last = 0, None
+    while True:
+        q = dict(query, _id={"$gt": last}) if last else query
+        batch = list(db.products.find(q, {"categoryIds": 1}).sort("_id", ASCENDING).limit(JOB_BATCH_SIZE))
+        if not batch:
+            break
+        db.products.bulk_write(
+            [UpdateOne({"_id": p["_id"]}, {"$set": category_fields(p.get("categoryIds") or [], tree)}) for p in batch],
+            ordered=False,
+        )
+        done, last = done + len(batch), batch[-1]["_id"]
+        jobs.progress(job_id, done)
+        time.sleep(JOB_BATCH_PAUSE)
+    page_cache.invalidate()
+
+
+@app.route("/admin/db-metrics")
+@login_required
+@admin_required
+def db_metrics():
+    return dict(mongo_metrics.snapshot(), config={
+        "maxPoolSize": MONGO_MAX_POOL_SIZE, "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS, "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+    })
+
+
+@app.route("/admin/query-audit")
+@login_required
+@admin_required
+def query_audit_report():
+    if not query_auditor:
+        return {"enabled": False, "hint": "set QUERY_AUDIT=1"}, 404
+    rows = query_auditor.report(only_unindexed=request.args.get("unindexed") == "1")
+    return {"enabled": True, "shapes": rows}
+
+
+@app.route("/admin/jobs")
+@login_required
+@admin_required
+def admin_jobs():
+    recent = db.jobs.find({}, {"params": 0, "error": 0}).sort("_id", DESCENDING).limit(20)
+    return {"jobs": [dict(j, _id=str(j["_id"])) for j in recent]}
+
+
 # --------------- admin: invite code ---------------
 @app.route("/admin/invite", methods=["GET", "POST"])
 @login_required
@@ -696,6 +1385,12 @@ def admin_invite():
 def health():
     return "OK", 200
 
+@app.route("/ready")
+def ready():
+    """Readiness probe: this worker can reach MongoDB."""
+    ok, error = mongo.ping()
+    return {"mongo": ok, "error": error, "pid": os.getpid()}, 200 if ok else 503
+
 @app.route("/pingdb")
 def ping_db():
     try:
@@ -707,6 +1402,203 @@ def ping_db():
 
 
 
+# --------------- CLI (flask --app flask_ecommerce <command>) ---------------
+@app.cli.command("ensure-indexes")
+@click.option("--dry-run", is_flag=True, help="Only report missing/conflicting indexes.")
+@click.option("--drop-conflicting", is_flag=True, help="Drop and rebuild indexes whose options differ from the spec.")
+def ensure_indexes_cmd(dry_run, drop_conflicting):
+    """Diff the declared indexes (indexes.INDEX_SPECS) against the server and build what is missing."""
+    rows = ensure_indexes(db, dry_run=dry_run, drop_conflicting=drop_conflicting, log=click.echo)
+    counts = {}
+    for row in rows:
+        counts[row["status"]] = counts.get(row["status"], 0) + 1
+    click.echo(", ".join(f"{k}: {v}" for k, v in sorted(counts.items())))
+    if counts.get("failed") or counts.get("duplicates") or (counts.get("conflict") and not dry_run):
+        raise SystemExit(1)
+
+
+@app.cli.command("report-duplicates")
+@click.option("--limit", default=100, show_default=True, help="Duplicate values to list per index.")
+def report_duplicates_cmd(limit):
+    """List values that block a declared unique index (e.g. products sharing a sku); exits 1 if any.
+
+    Resolve them (rename or delete the extra documents), then run ensure-indexes --drop-conflicting.
+    """
+    found = 0
+    for spec in INDEX_SPECS:
+        if not spec.get("unique"):
+            continue
+        dups = find_duplicates(db, spec, limit)
+        label = f"{spec['collection']} {[k for k, _ in spec['keys']]}"
+        click.echo(f"{label}: {len(dups)}{'+' if len(dups) == limit else ''} duplicate value(s)")
+        for d in dups:
+            docs = db[spec["collection"]].find({"_id": {"$in": d["ids"]}}, {"title": 1, "email": 1, "createdAt": 1})
+            click.echo(f"  {d['key']} x{d['count']}")
+            for doc in docs:
+                click.echo(f"    {doc['_id']}  {doc.get('createdAt', '')}  {doc.get('title') or doc.get('email') or ''}")
+        found += len(dups)
+    if found:
+        raise SystemExit(1)
+
+
+@app.cli.command("seed-data")
+@click.option("--products", default=10000, show_default=True)
+@click.option("--depth", default=3, show_default=True, help="Category tree levels.")
+@click.option("--branching", default=5, show_default=True, help="Children per category.")
+@click.option("--users", default=1000, show_default=True)
+@click.option("--carts-per-user", default=3, show_default=True)
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--workers", default=4, show_default=True, help="insert_many batches in flight.")
+@click.option("--seed", "rng_seed", default=1, show_default=True, help="Random seed.")
+@click.option("--prefix", default="", help="Added to SKUs, emails and root category names, to seed again without --drop.")
+@click.option("--drop", is_flag=True, help="Drop categories/products/users/carts first.")
+def seed_data(products, depth, branching, users, carts_per_user, batch_size, workers, rng_seed, prefix, drop):
+    """Bulk-insert a synthetic category tree, products, users and carts for scale testing."""
+    if drop:
+        if not click.confirm(f"Drop categories, products, users and carts in {DB_NAME}?"):
+            return
+        for name in ("categories", "products", "users", "carts"):
+            db.drop_collection(name)
+    try:
+        summary = generate_synthetic(
+            db, products=products, depth=depth, branching=branching, users=users, carts_per_user=carts_per_user,
+            batch_size=batch_size, workers=workers, rng_seed=rng_seed, cart_schema_version=CART_SCHEMA_VERSION,
+            prefix=prefix, log=click.echo,
+        )
+    except ValueError as e:
+        raise click.ClickException(f"{e}; use --drop, or a new --prefix")
+    category_cache.bump()
+    page_cache.invalidate()
+    click.echo(f"Inserted {summary['categories']} categories, {summary['products']} products, "
+               f"{summary['users']} users, {summary['cart_items']} cart items in {summary['seconds']}s "
+               f"({summary['docs_per_minute']} docs/min)")
+
+
+@app.cli.command("import-products")
+@click.argument("source", type=click.File("r", encoding="utf-8-sig"))
+@click.option("--format", "fmt", type=click.Choice(sorted(IMPORT_FORMATS)), help="Default: from the file extension.")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--dry-run", is_flag=True, help="Only validate.")
+def import_products_cmd(source, fmt, batch_size, dry_run):
+    """Upsert products by sku from a CSV/JSONL file (`-` for stdin)."""
+    fmt = fmt or source.name.rsplit(".", 1)[-1].lower()
+    if fmt not in IMPORT_FORMATS:
+        raise click.UsageError("cannot tell the format from the file name, pass --format")
+    result = import_products(db, read_rows(source, fmt), category_cache.tree(fresh=True), batch_size, dry_run=dry_run)
+    for line, message in result["errors"]:
+        click.echo(f"line {line}: {message}", err=True)
+    if result["inserted"] or result["updated"]:
+        page_cache.invalidate()
+    click.echo(f"{result['rows']} rows, {result['valid']} valid, {result['error_count']} rejected; "
+               f"{result['inserted']} inserted, {result['updated']} updated" + (" (dry run)" if dry_run else ""))
+    if result["error_count"]:
+        raise SystemExit(1)
+
+
+@app.cli.command("export-products")
+@click.argument("target", type=click.File("w", encoding="utf-8"), default="-")
+@click.option("--format", "fmt", type=click.Choice(sorted(IMPORT_FORMATS)), default="jsonl", show_default=True)
+def export_products_cmd(target, fmt):
+    """Stream every product as CSV/JSONL to a file (default stdout)."""
+    for chunk in export_products(db, fmt):
+        target.write(chunk)
+
+
+@app.cli.command("backfill-image-variants")
+def backfill_image_variants():
+    """Generate resized variants for product images uploaded before variants existed.
+
+    Running workers may have the original cached under a variant's key; their memory entries
+    expire after IMAGE_CACHE_MEM_SECONDS (restart them to serve the variants right away).
+    """
+    done = 0
+    for p in db.products.find({"imageIds.0": {"$exists": True}}, {"imageIds": 1}):
+        for fid in p["imageIds"]:
+            try:
+                gridout = fs.get(fid)
+            except Exception:
+                continue
+            if getattr(gridout, "variants", None) is not None:
+                continue
+            variants = put_variants(fid, gridout.read(), gridout.filename or str(fid), p["_id"])
+            db.fs.files.update_one({"_id": fid}, {"$set": {"variants": variants}})
+            for size in IMAGE_VARIANTS:
+                image_cache.discard(image_cache_key(fid, size))
+            done += 1
+    click.echo(f"Backfilled variants for {done} images")
+    if done:
+        click.echo(f"Running workers serve them within {IMAGE_CACHE_MEM_SECONDS:g}s (IMAGE_CACHE_MEM_SECONDS), or after a restart")
+
+
+@app.cli.command("migrate-carts")
+@click.option("--batch-size", default=1000, show_default=True)
+def migrate_carts(batch_size):
+    """Canonicalize every cart in bulk so the request path never has to normalize."""
+    ops, users, written = [], 0, 0
+    cursor = db.carts.find({}).sort("userId", ASCENDING)  # served by the (userId, product_id) index
+    for _, items in groupby(cursor, key=lambda it: it.get("userId")):
+        users += 1
+        ops += _cart_fix_ops(list(items))
+        if len(ops) >= batch_size:
+            written += len(ops)
+            db.carts.bulk_write(ops, ordered=True)
+            ops = []
+    if ops:
+        written += len(ops)
+        db.carts.bulk_write(ops, ordered=True)
+    click.echo(f"Checked {users} carts, applied {written} fixes")
+
+
+@app.cli.command("rebuild-category-ancestors")
+def rebuild_category_ancestors():
+    """Recompute the materialized `ancestors` array of every category from the parentId links."""
+    nodes = {c["_id"]: c for c in db.categories.find({}, {"parentId": 1, "ancestors": 1})}
+    ops = []
+    for cid, c in nodes.items():
+        chain, seen, parent = [], {cid}, c.get("parentId")
+        while parent in nodes and parent not in seen:
+            chain.append(parent)
+            seen.add(parent)
+            parent = nodes[parent].get("parentId")
+        chain.reverse()
+        if c.get("ancestors") != chain:
+            ops.append(UpdateOne({"_id": cid}, {"$set": {"ancestors": chain}}))
+    if ops:
+        db.categories.bulk_write(ops, ordered=False)
+        category_cache.bump()
+    click.echo(f"Updated ancestors on {len(ops)} of {len(nodes)} categories")
+
+
+@app.cli.command("sync-product-categories")
+def sync_product_categories_cmd():
+    """Backfill/repair the denormalized categoryPaths on every product."""
+    job_id = jobs.create("sync_product_categories")
+    jobs.run(job_id)
+    click.echo(f"Synced categories on {db.jobs.find_one({'_id': job_id})['done']} products")
+
+
+@app.cli.command("query-audit")
+@click.option("--unindexed", is_flag=True, help="Only shapes whose winning plan has a COLLSCAN.")
+@click.option("--limit", default=50, show_default=True)
+def query_audit_cmd(unindexed, limit):
+    """Print query shapes recorded by QUERY_AUDIT=1 workers, worst first."""
+    for r in QueryAuditor(lambda: db).report(only_unindexed=unindexed, limit=limit):
+        if r.get("error"):
+            click.echo(f"ERROR {r['command']} {r['collection']} [{r.get('endpoint')}] {r['error']}")
+            continue
+        flag = "COLLSCAN" if r["collscan"] else "indexed "
+        click.echo(
+            f"{flag} {r['docsExamined']:>8} examined / {r['nReturned']:>6} returned  "
+            f"{r['command']} {r['collection']} [{r.get('endpoint')}] {r['plan']}\n    {r['shape']}"
+        )
+
+
+@app.cli.command("run-jobs")
+def run_jobs():
+    """Run background jobs that were queued or interrupted (e.g. by a worker restart)."""
+    click.echo(f"Ran {jobs.run_pending()} jobs")
+
+
 # if __name__ == "__main__":
 #     app.run(debug=True)
 
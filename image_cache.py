@@ -0,0 +1,192 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class ImageCache:
+    """Byte-bounded LRU for immutable GridFS images: a memory tier plus an optional disk tier.
+
+    Entries are (meta, data) where meta is a small JSON-able dict (content_type, length, etag, modified).
+    Keys are file ObjectIds (as str). Both tiers evict least-recently-used entries once their byte budget is exceeded.
+
+    discard() reaches this process's memory tier and the disk tier only; other workers' memory
+    entries expire `mem_ttl` seconds after they were filled, which bounds how long a deleted or
+    replaced image (or variant) can still be served there.
+
+    The disk directory may be shared by several worker processes: a file another worker wrote is
+    adopted on first lookup, and the index is rebuilt from the directory (oldest mtime first; hits
+    touch the file) every DISK_RESCAN_SECONDS, so the disk budget applies to the directory as a whole.
+    """
+
+    DISK_RESCAN_SECONDS = 10.0
+
+    def __init__(self, max_bytes, max_item_bytes, disk_dir="", disk_max_bytes=0, mem_ttl=300):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.mem_ttl = mem_ttl
+        self._mem = OrderedDict()   # key -> (expires at, (meta, data))
+        self._mem_bytes = 0
+        self._disk = OrderedDict()  # key -> size on disk
+        self._disk_bytes = 0
+        self._scanned = float("-inf")
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._scan_disk()
+
+    # ---- public API ----
+    def get(self, key):
+        key = str(key)
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None and hit[0] <= time.monotonic():
+                del self._mem[key]
+                self._mem_bytes -= len(hit[1][1])
+            elif hit is not None:
+                self._mem.move_to_end(key)
+                self.stats["hits"] += 1
+                return hit[1]
+        entry = self._disk_get(key)
+        with self._lock:
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+        self._mem_put(key, entry)
+        return entry
+
+    def put(self, key, meta, data):
+        if len(data) > self.max_item_bytes:
+            return
+        key = str(key)
+        self._mem_put(key, (meta, data))
+        self._disk_put(key, meta, data)
+
+    def discard(self, key):
+        key = str(key)
+        with self._lock:
+            hit = self._mem.pop(key, None)
+            if hit is not None:
+                self._mem_bytes -= len(hit[1][1])
+            size = self._disk.pop(key, None)
+            if size is not None:
+                self._disk_bytes -= size
+        if self.disk_dir:
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def snapshot(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                mem_items=len(self._mem), mem_bytes=self._mem_bytes, mem_max_bytes=self.max_bytes,
+                disk_items=len(self._disk), disk_bytes=self._disk_bytes, disk_max_bytes=self.disk_max_bytes,
+            )
+
+    # ---- memory tier ----
+    def _mem_put(self, key, entry):
+        size = len(entry[1])
+        with self._lock:
+            old = self._mem.pop(key, None)
+            if old is not None:
+                self._mem_bytes -= len(old[1][1])
+            self._mem[key] = (time.monotonic() + self.mem_ttl, entry)
+            self._mem_bytes += size
+            while self._mem_bytes > self.max_bytes and self._mem:
+                _, (_, (_, data)) = self._mem.popitem(last=False)
+                self._mem_bytes -= len(data)
+                self.stats["evictions"] += 1
+
+    # ---- disk tier ----
+    def _paths(self, key):
+        base = os.path.join(self.disk_dir, key)
+        return base + ".bin", base + ".json"
+
+    def _scan_disk(self):
+        """Rebuild the disk index from the directory, which other workers write to as well."""
+        found = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".bin"):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            found.append((st.st_mtime, name[:-4], st.st_size))
+        disk = OrderedDict((key, size) for _, key, size in sorted(found))
+        with self._lock:
+            self._disk, self._disk_bytes = disk, sum(disk.values())
+            self._scanned = time.monotonic()
+
+    def _disk_get(self, key):
+        # not gated on the index: the file may have been written by another worker
+        if not self.disk_dir:
+            return None
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(data_path, "rb") as f:
+                data = f.read()
+            os.utime(data_path)
+        except (OSError, ValueError):
+            with self._lock:  # gone (e.g. evicted by another worker)
+                size = self._disk.pop(key, None)
+                if size is not None:
+                    self._disk_bytes -= size
+            return None
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            else:
+                self._disk[key] = len(data)
+                self._disk_bytes += len(data)
+        return meta, data
+
+    def _disk_put(self, key, meta, data):
+        if not self.disk_dir or len(data) > self.disk_max_bytes:
+            return
+        data_path, meta_path = self._paths(key)
+        try:
+            # meta first: a reader that finds the .bin always finds its .json
+            for path, content in ((meta_path, json.dumps(meta).encode()), (data_path, data)):
+                fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")  # unique per thread and process
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(content)
+                    os.replace(tmp, path)
+                except BaseException:
+                    os.remove(tmp)
+                    raise
+        except OSError:
+            return
+        if time.monotonic() - self._scanned > self.DISK_RESCAN_SECONDS:
+            self._scan_disk()
+        evicted = []
+        with self._lock:
+            old = self._disk.pop(key, None)
+            if old is not None:
+                self._disk_bytes -= old
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+            while self._disk_bytes > self.disk_max_bytes and self._disk:
+                k, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                self.stats["disk_evictions"] += 1
+                evicted.append(k)
+        for k in evicted:
+            for path in self._paths(k):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
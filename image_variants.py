@@ -0,0 +1,53 @@
+import io
+
+from PIL import Image
+
+# name -> bounding box (w, h); sized for 2x displays of the <img> boxes in the templates
+IMAGE_VARIANTS = {
+    "thumb": (96, 96),
+    "listing": (320, 320),
+    "detail": (960, 960),
+}
+
+_KEEP_FORMATS = ("JPEG", "PNG", "WEBP", "GIF")
+_SAVE_MODES = {"JPEG": ("RGB", "L"), "PNG": ("1", "L", "LA", "I", "P", "RGB", "RGBA"), "WEBP": ("RGB", "RGBA")}
+
+
+def make_variants(data):
+    """Return {variant name: (bytes, content_type)} for every variant smaller than the original.
+
+    Variants the original already fits into are skipped (the original is served for them);
+    data Pillow cannot decode yields {}, and a variant that fails to resize or encode is left out.
+    """
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except Exception:
+        return {}
+    fmt = img.format if img.format in _KEEP_FORMATS else "PNG"
+    out = {}
+    for name, box in IMAGE_VARIANTS.items():
+        if img.width <= box[0] and img.height <= box[1]:
+            continue
+        try:
+            v = _saveable(img, fmt)
+            v = img.copy() if v is img else v
+            v.thumbnail(box)
+            buf = io.BytesIO()
+            v.save(buf, fmt)
+        except Exception:  # e.g. a mode the encoder rejects; the original is served for this size
+            continue
+        out[name] = (buf.getvalue(), Image.MIME[fmt])
+    return out
+
+
+def _saveable(img, fmt):
+    """img in a mode that can be resized and that the `fmt` encoder writes (GIF quantizes whatever it gets)."""
+    if img.mode.startswith("I;16"):  # 16-bit grayscale: resizable as "I", which PNG still writes as 16 bit
+        img = img.convert("I")
+    modes = _SAVE_MODES.get(fmt)
+    if modes is None or img.mode in modes:
+        return img
+    if fmt != "JPEG" and ("A" in img.mode or "transparency" in img.info):
+        return img.convert("RGBA")
+    return img.convert("RGB")
@@ -0,0 +1,127 @@
+from pymongo import ASCENDING, DESCENDING, TEXT
+
+# Every index the app relies on. Applied by `flask --app flask_ecommerce ensure-indexes`, never at startup.
+INDEX_SPECS = [
+    {"collection": "carts", "keys": [("userId", ASCENDING), ("product_id", ASCENDING)], "unique": True},
+    {"collection": "categories", "keys": [("path", ASCENDING)]},
+    {"collection": "categories", "keys": [("ancestors", ASCENDING)]},
+    {"collection": "products", "keys": [("status", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)]},
+    {"collection": "products", "keys": [("createdAt", DESCENDING)]},
+    {"collection": "products", "keys": [("title", TEXT)]},
+    {"collection": "products", "keys": [("sku", ASCENDING)], "unique": True, "sparse": True},
+    {"collection": "products", "keys": [("categoryIds", ASCENDING)]},
+    {"collection": "users", "keys": [("email", ASCENDING)], "unique": True},
+]
+
+_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+
+def _norm(direction):
+    return direction if isinstance(direction, str) else int(direction)
+
+
+def _key_signature(keys):
+    """Comparable form of a declared index key; text fields are compared as a set."""
+    keys = list(keys)
+    text = sorted(k for k, v in keys if v == TEXT)
+    plain = tuple((k, _norm(v)) for k, v in keys if v != TEXT)
+    return ("text", plain, tuple(text)) if text else plain
+
+
+def _existing_signature(info):
+    if "weights" in info:
+        plain = tuple((k, _norm(v)) for k, v in info["key"] if k not in ("_fts", "_ftsx"))
+        return ("text", plain, tuple(sorted(info["weights"])))
+    return tuple((k, _norm(v)) for k, v in info["key"])
+
+
+def diff_indexes(db, specs=INDEX_SPECS):
+    """Compare declared specs with the server; returns a list of report rows.
+
+    status is "ok", "missing", "conflict" (same keys, different options -- or a second text
+    index on a collection that already has one) or "undeclared" (present but not in specs).
+    """
+    rows, existing = [], {}
+    for coll in sorted({s["collection"] for s in specs}):
+        try:
+            existing[coll] = db[coll].index_information()
+        except Exception:  # collection does not exist yet
+            existing[coll] = {}
+
+    matched = set()
+    for spec in specs:
+        coll, sig = spec["collection"], _key_signature(spec["keys"])
+        want = {k: spec[k] for k in _OPTIONS if k in spec}
+        row = {"collection": coll, "keys": spec["keys"], "options": want, "status": "missing", "name": None}
+        for name, info in existing[coll].items():
+            if _existing_signature(info) != sig and not (sig[0] == "text" and "weights" in info):
+                continue
+            matched.add((coll, name))
+            have = {k: info[k] for k in _OPTIONS if k in info}
+            row["name"] = name
+            row["status"] = "ok" if have == want and _existing_signature(info) == sig else "conflict"
+            if row["status"] == "conflict":
+                row["existing"] = {"key": list(info["key"]), **have}
+            break
+        rows.append(row)
+
+    for coll, infos in existing.items():
+        for name, info in infos.items():
+            if name != "_id_" and (coll, name) not in matched:
+                rows.append({"collection": coll, "keys": list(info["key"]), "name": name, "status": "undeclared"})
+    return rows
+
+
+def find_duplicates(db, spec, limit=100):
+    """Values that would violate a unique spec: [{"key": {...}, "count": n, "ids": [first 10 _ids]}]."""
+    fields = [k for k, _ in spec["keys"]]
+    pipeline = []
+    if spec.get("sparse"):
+        pipeline.append({"$match": {f: {"$exists": True} for f in fields}})
+    pipeline += [
+        {"$group": {"_id": {f.replace(".", "_"): f"${f}" for f in fields}, "count": {"$sum": 1}, "ids": {"$push": "$_id"}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+        {"$project": {"count": 1, "ids": {"$slice": ["$ids", 10]}}},
+    ]
+    return [{"key": d["_id"], "count": d["count"], "ids": d["ids"]}
+            for d in db[spec["collection"]].aggregate(pipeline, allowDiskUse=True)]
+
+
+def ensure_indexes(db, specs=INDEX_SPECS, dry_run=False, drop_conflicting=False, log=print):
+    """Create missing indexes (background builds); optionally rebuild conflicting ones. Returns the diff rows.
+
+    A unique index is neither built nor dropped-for-rebuild while the collection still holds
+    duplicates for it; those rows get status "duplicates" (see find_duplicates).
+    """
+    rows = diff_indexes(db, specs)
+    for row in rows:
+        label = f"{row['collection']} {row['keys']} {row.get('options') or ''}".rstrip()
+        if row["status"] == "ok":
+            continue
+        if row["status"] == "undeclared":
+            log(f"undeclared: {row['collection']}.{row['name']}")
+            continue
+        if row["options"].get("unique"):
+            dups = find_duplicates(db, {"collection": row["collection"], "keys": row["keys"], **row["options"]}, limit=5)
+            if dups:
+                row["status"], row["duplicates"] = "duplicates", dups
+                log(f"duplicates: {label} cannot be built, e.g. " + "; ".join(f"{d['key']} x{d['count']}" for d in dups))
+                continue
+        if row["status"] == "conflict":
+            log(f"conflict:   {label} vs existing {row['name']} {row['existing']}")
+            if not drop_conflicting or dry_run:
+                continue
+            db[row["collection"]].drop_index(row["name"])
+        else:
+            log(f"missing:    {label}")
+            if dry_run:
+                continue
+        try:
+            db[row["collection"]].create_index(row["keys"], background=True, **row["options"])
+            row["status"] = "created"
+        except Exception as e:
+            row["status"], row["error"] = "failed", str(e)
+            log(f"  failed: {e}")
+    return rows
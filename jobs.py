@@ -0,0 +1,77 @@
+import queue
+import threading
+import traceback
+from datetime import datetime
+
+
+class JobRunner:
+    """Runs fan-out maintenance work off the request path.
+
+    Jobs are recorded in `db.jobs` (name, params, status, done/total) and executed one at a time on a
+    per-process daemon thread. Handlers must be idempotent: a job left "queued" or "running" by a dead
+    process can be re-run with run_pending().
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.handlers = {}
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def handler(self, name):
+        def register(fn):
+            self.handlers[name] = fn
+            return fn
+
+        return register
+
+    def create(self, name, **params):
+        """Record a queued job without scheduling it (see run / run_pending)."""
+        return self.db.jobs.insert_one(
+            {"name": name, "params": params, "status": "queued", "done": 0, "total": None,
+             "createdAt": datetime.utcnow()}
+        ).inserted_id
+
+    def submit(self, name, **params):
+        """Record a job and run it on the background thread; returns the job id."""
+        job_id = self.create(name, **params)
+        self._queue.put(job_id)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="jobs", daemon=True)
+                self._thread.start()
+        return job_id
+
+    def progress(self, job_id, done, total=None):
+        fields = {"done": done}
+        if total is not None:
+            fields["total"] = total
+        self.db.jobs.update_one({"_id": job_id}, {"$set": fields})
+
+    def run(self, job_id):
+        job = self.db.jobs.find_one_and_update(
+            {"_id": job_id}, {"$set": {"status": "running", "startedAt": datetime.utcnow()}}
+        )
+        if not job:
+            return
+        try:
+            self.handlers[job["name"]](job_id, **job["params"])
+        except Exception:
+            self.db.jobs.update_one(
+                {"_id": job_id},
+                {"$set": {"status": "failed", "error": traceback.format_exc(), "finishedAt": datetime.utcnow()}},
+            )
+            return
+        self.db.jobs.update_one({"_id": job_id}, {"$set": {"status": "done", "finishedAt": datetime.utcnow()}})
+
+    def run_pending(self):
+        """Synchronously (re)run every job not finished yet, oldest first; returns how many ran."""
+        ids = [j["_id"] for j in self.db.jobs.find({"status": {"$in": ["queued", "running"]}}, {"_id": 1}).sort("_id", 1)]
+        for job_id in ids:
+            self.run(job_id)
+        return len(ids)
+
+    def _loop(self):
+        while True:
+            self.run(self._queue.get())
@@ -0,0 +1,59 @@
+import os
+import threading
+
+from gridfs import GridFS
+from pymongo import MongoClient
+
+
+class Mongo:
+    """Lazily created, per-process MongoClient / Database / GridFS.
+
+    Nothing connects at import time. The client is built on first use and rebuilt if the pid
+    changes, so a pre-forking server (gunicorn --preload) never shares a client across a fork.
+    """
+
+    def __init__(self, uri, db_name, **client_options):
+        self.uri = uri
+        self.db_name = db_name
+        self.client_options = client_options
+        self._pid = None
+        self._client = self._db = self._fs = None
+        self._lock = threading.Lock()
+
+    def _ensure(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            client = MongoClient(self.uri, connect=False, **self.client_options)
+            self._db = client[self.db_name]
+            self._fs = GridFS(self._db)
+            self._client = client
+            self._pid = os.getpid()
+
+    @property
+    def client(self):
+        self._ensure()
+        return self._client
+
+    @property
+    def db(self):
+        self._ensure()
+        return self._db
+
+    @property
+    def fs(self):
+        self._ensure()
+        return self._fs
+
+    @property
+    def started(self):
+        return self._pid == os.getpid()
+
+    def ping(self):
+        try:
+            self.client.admin.command("ping")
+            return True, None
+        except Exception as e:
+            return False, str(e)
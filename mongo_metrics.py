@@ -0,0 +1,108 @@
+import threading
+import time
+
+from pymongo import monitoring
+
+
+class MongoMetrics:
+    """Process-wide counters fed by pymongo's connection pool and command monitoring events.
+
+    Pass `listeners()` to MongoClient(event_listeners=...); read with snapshot().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()  # check-out start time of the current thread
+        self.pool = {
+            "connections_created": 0, "connections_closed": 0, "checkouts": 0, "checkout_failures": 0,
+            "checkins": 0, "in_use": 0, "max_in_use": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0, "pool_cleared": 0,
+        }
+        self.commands = {}  # command name -> {"count", "failed", "total_ms", "max_ms"}
+
+    def listeners(self):
+        return [_PoolListener(self), _CommandListener(self)]
+
+    def snapshot(self):
+        with self._lock:
+            pool = dict(self.pool)
+            pool["wait_ms_avg"] = pool["wait_ms_total"] / pool["checkouts"] if pool["checkouts"] else 0.0
+            commands = {
+                name: dict(c, avg_ms=c["total_ms"] / c["count"] if c["count"] else 0.0)
+                for name, c in self.commands.items()
+            }
+        return {"pool": pool, "commands": commands}
+
+    def _command_done(self, name, duration_micros, failed):
+        ms = duration_micros / 1000.0
+        with self._lock:
+            c = self.commands.setdefault(name, {"count": 0, "failed": 0, "total_ms": 0.0, "max_ms": 0.0})
+            c["count"] += 1
+            c["failed"] += failed
+            c["total_ms"] += ms
+            c["max_ms"] = max(c["max_ms"], ms)
+
+
+class _PoolListener(monitoring.ConnectionPoolListener):
+    def __init__(self, metrics):
+        self.m = metrics
+
+    def _inc(self, key, n=1):
+        with self.m._lock:
+            self.m.pool[key] += n
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):  # pymongo 4 (the Motor path); pymongo 3 never emits it
+        pass
+
+    def pool_cleared(self, event):
+        self._inc("pool_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._inc("connections_created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._inc("connections_closed")
+
+    def connection_check_out_started(self, event):
+        self.m._local.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._inc("checkout_failures")
+
+    def connection_checked_out(self, event):
+        started = getattr(self.m._local, "started", None)
+        wait = (time.perf_counter() - started) * 1000.0 if started else 0.0
+        with self.m._lock:
+            p = self.m.pool
+            p["checkouts"] += 1
+            p["in_use"] += 1
+            p["max_in_use"] = max(p["max_in_use"], p["in_use"])
+            p["wait_ms_total"] += wait
+            p["wait_ms_max"] = max(p["wait_ms_max"], wait)
+
+    def connection_checked_in(self, event):
+        with self.m._lock:
+            self.m.pool["checkins"] += 1
+            self.m.pool["in_use"] -= 1
+
+
+class _CommandListener(monitoring.CommandListener):
+    def __init__(self, metrics):
+        self.m = metrics
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.m._command_done(event.command_name, event.duration_micros, 0)
+
+    def failed(self, event):
+        self.m._command_done(event.command_name, event.duration_micros, 1)
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request, session
+from flask_login import current_user
+
+
+class MemoryBackend:
+    """Per-worker LRU with per-entry expiry."""
+
+    blocking = False
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._data = OrderedDict()  # key -> (expires at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            hit = self._data.get(key)
+            if not hit:
+                return None
+            if hit[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return hit[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisBackend:
+    """Shared cache in a Redis-compatible server; clear() bumps a generation number baked into every key."""
+
+    blocking = True  # network round trips: kept off the event loop by cached_async
+
+    def __init__(self, url, namespace="pagecache"):
+        import redis  # optional dependency, only needed when PAGE_CACHE_URL points at redis
+
+        self.r = redis.Redis.from_url(url)
+        self.ns = namespace
+
+    def _key(self, key):
+        gen = int(self.r.get(f"{self.ns}:gen") or 0)
+        return f"{self.ns}:{gen}:{key}"
+
+    def get(self, key):
+        return self.r.get(self._key(key))
+
+    def set(self, key, value, ttl):
+        self.r.set(self._key(key), value, ex=max(1, int(ttl)))
+
+    def clear(self):
+        self.r.incr(f"{self.ns}:gen")
+
+
+class PageCache:
+    """Whole-response cache for anonymous GET pages, keyed by path and query string."""
+
+    def __init__(self, url="", ttl=30, max_items=1000):
+        self.backend = RedisBackend(url) if url else MemoryBackend(max_items)
+        self.ttl = ttl
+        self.executor = None  # where cached_async runs blocking backend calls (None: the loop's default)
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0}
+
+    def cached(self, view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # logged-in pages are personalized and pending flashes must render exactly once
+            if request.method != "GET" or current_user.is_authenticated or session.get("_flashes"):
+                self.stats["bypassed"] += 1
+                return view(*args, **kwargs)
+            key = self._key()
+            hit = self._lookup(key)
+            if hit is not None:
+                return hit
+            return self._store(key, view(*args, **kwargs))
+
+        return wrapper
+
+    def cached_async(self, view):
+        """cached() for coroutine views; a session with a user id bypasses without loading the user."""
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            if request.method != "GET" or session.get("_user_id") or session.get("_flashes"):
+                self.stats["bypassed"] += 1
+                return await view(*args, **kwargs)
+            key = self._key()
+            hit = self._hit(key, await self._run(self.backend.get, key))
+            if hit is not None:
+                return hit
+            resp = self._response(await view(*args, **kwargs))
+            if "X-Cache" in resp.headers:
+                await self._run(self.backend.set, key, resp.get_data(), self.ttl)
+            return resp
+
+        return wrapper
+
+    async def _run(self, fn, *args):
+        if not self.backend.blocking:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def _key(self):
+        return f"{request.path}?{'&'.join(sorted(f'{k}={v}' for k, v in request.args.items(multi=True)))}"
+
+    def _lookup(self, key):
+        return self._hit(key, self.backend.get(key))
+
+    def _hit(self, key, body):
+        if body is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return Response(body, mimetype="text/html", headers={"X-Cache": "HIT"})
+
+    def _store(self, key, rv):
+        resp = self._response(rv)
+        if "X-Cache" in resp.headers:
+            self.backend.set(key, resp.get_data(), self.ttl)
+        return resp
+
+    def _response(self, rv):
+        """The view's response, marked X-Cache: MISS if it may be stored."""
+        resp = make_response(rv)
+        if resp.status_code == 200 and not resp.direct_passthrough and not session.get("_flashes"):
+            resp.headers["X-Cache"] = "MISS"
+        return resp
+
+    def invalidate(self):
+        self.backend.clear()
@@ -0,0 +1,192 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+# CSV columns; `categories` holds category paths separated by "|", `extra_attrs` a JSON object.
+# On import, `attr.<name>` columns are accepted as well and merged into extra_attrs.
+CSV_COLUMNS = ("sku", "title", "price", "stock", "status", "categories", "extra_attrs")
+EXPORT_FIELDS = {"_id": 0, "sku": 1, "title": 1, "price": 1, "stock": 1, "status": 1, "categoryPaths": 1, "extra_attrs": 1}
+CATEGORY_SEP = "|"
+MAX_REPORTED_ERRORS = 100
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, raw dict) from a text stream, one row at a time."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for n, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield n, RowError(f"invalid JSON: {e}")
+                continue
+            yield n, row if isinstance(row, dict) else RowError("expected a JSON object")
+    else:
+        raise ValueError(f"unknown format {fmt!r} (csv or jsonl)")
+
+
+def _categories(value):
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [p.strip() for p in value.split(CATEGORY_SEP) if p.strip()]
+    if isinstance(value, list):
+        return [str(p).strip() for p in value if str(p).strip()]
+    raise RowError("categories must be a list or a '|' separated string")
+
+
+def _extra_attrs(row):
+    attrs = row.get("extra_attrs")
+    if isinstance(attrs, str):
+        try:
+            attrs = json.loads(attrs) if attrs.strip() else None
+        except ValueError:
+            raise RowError("extra_attrs is not valid JSON")
+    if attrs is not None and not isinstance(attrs, dict):
+        raise RowError("extra_attrs must be an object")
+    for key, value in row.items():
+        if isinstance(key, str) and key.startswith("attr.") and value not in (None, ""):
+            attrs = dict(attrs or {}, **{key[5:]: value})
+    return attrs
+
+
+def _given(row, key):
+    """A CSV row has every header column, so a blank cell counts as not provided."""
+    return row.get(key) not in (None, "")
+
+
+def product_fields(row, tree):
+    """Validated ($set fields, $setOnInsert defaults) for one import row; raises RowError.
+
+    sku, title and price are required. stock, status, categories and extra_attrs are only written
+    when the row has a non-blank value for them, so a partial feed (say sku,title,price, or blank
+    cells) leaves them alone on existing products; new products get the defaults. JSONL
+    "categories": [] clears the categories.
+    """
+    sku = str(row.get("sku") or "").strip()
+    title = str(row.get("title") or "").strip()
+    if not sku:
+        raise RowError("sku is required")
+    if not title:
+        raise RowError("title is required")
+    try:
+        price = float(row.get("price"))
+    except (TypeError, ValueError):
+        raise RowError("price must be a number")
+    if price < 0:
+        raise RowError("price must not be negative")
+    fields = {"sku": sku, "title": title, "price": price}
+    defaults = {"stock": 0, "status": "active", "categoryIds": [], "categoryPaths": []}
+
+    if _given(row, "stock"):
+        try:
+            fields["stock"] = int(row["stock"])
+        except (TypeError, ValueError):
+            raise RowError("stock must be an integer")
+    if _given(row, "status"):
+        fields["status"] = str(row["status"]).strip().lower()
+        if fields["status"] not in ("active", "inactive"):
+            raise RowError("status must be active or inactive")
+    key = "categories" if _given(row, "categories") else "categoryPaths" if _given(row, "categoryPaths") else None
+    if key:
+        paths = _categories(row[key])
+        unknown = [p for p in paths if p not in tree.by_path]
+        if unknown:
+            raise RowError(f"unknown categories: {', '.join(unknown)}")
+        fields["categoryIds"] = [tree.by_path[p]["_id"] for p in paths]
+        fields["categoryPaths"] = paths
+    attrs = _extra_attrs(row)
+    if attrs is not None:
+        fields["extra_attrs"] = attrs
+    return fields, {k: v for k, v in defaults.items() if k not in fields}
+
+
+def import_products(db, rows, tree, batch_size=1000, dry_run=False):
+    """Validate rows from read_rows() and upsert them by sku with unordered bulk_write batches.
+
+    Invalid rows are skipped and reported; within one batch the last row for a sku wins.
+    Returns {"rows", "valid", "inserted", "updated", "errors": [(line, message), ...], "error_count"}.
+    """
+    stats = {"rows": 0, "valid": 0, "inserted": 0, "updated": 0, "errors": [], "error_count": 0}
+    batch = {}
+
+    def error(line, message):
+        stats["error_count"] += 1
+        if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+            stats["errors"].append((line, message))
+
+    def flush():
+        if not batch or dry_run:
+            batch.clear()
+            return
+        now = datetime.utcnow()
+        ops = [
+            UpdateOne(
+                {"sku": sku},
+                {"$set": fields, "$setOnInsert": dict(defaults, createdAt=now, imageIds=[], images=[])},
+                upsert=True,
+            )
+            for sku, (fields, defaults) in batch.items()
+        ]
+        batch.clear()
+        res = db.products.bulk_write(ops, ordered=False)
+        stats["inserted"] += res.upserted_count
+        stats["updated"] += res.matched_count
+
+    for line, row in rows:
+        stats["rows"] += 1
+        if isinstance(row, RowError):
+            error(line, str(row))
+            continue
+        try:
+            fields, defaults = product_fields(row, tree)
+        except RowError as e:
+            error(line, str(e))
+            continue
+        stats["valid"] += 1
+        batch[fields["sku"]] = (fields, defaults)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return stats
+
+
+def export_products(db, fmt, query=None, batch_size=1000):
+    """Yield the catalog as CSV or JSONL text chunks, streaming from one cursor (_id order).
+
+    (Not sku order: the sku index is sparse, so it cannot serve a sort over every product.)
+    """
+    cursor = db.products.find(query or {}, EXPORT_FIELDS).sort("_id", 1).batch_size(batch_size)
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(CSV_COLUMNS)
+        for n, p in enumerate(cursor, 1):
+            attrs = p.get("extra_attrs")
+            writer.writerow([
+                p.get("sku", ""), p.get("title", ""), p.get("price", ""), p.get("stock", 0), p.get("status", "active"),
+                CATEGORY_SEP.join(p.get("categoryPaths") or []), json.dumps(attrs) if attrs else "",
+            ])
+            if n % 100 == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+    elif fmt == "jsonl":
+        for p in cursor:
+            p["categories"] = p.pop("categoryPaths", None) or []
+            yield json.dumps(p, default=str) + "\n"
+    else:
+        raise ValueError(f"unknown format {fmt!r} (csv or jsonl)")
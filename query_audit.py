@@ -0,0 +1,140 @@
+import queue
+import threading
+from datetime import datetime
+
+from flask import has_request_context, request
+from pymongo import monitoring
+
+AUDITED_COMMANDS = ("find", "aggregate", "count", "distinct", "update", "delete")
+_SHAPE_FIELDS = ("filter", "pipeline", "sort", "query", "key", "updates", "deletes")
+# driver/session fields that must not be sent back inside an explain
+_STRIP = ("lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern")
+
+
+def shape_of(value):
+    """Query shape: keep operators and field names, replace literal values by their type name."""
+    if isinstance(value, dict):
+        return {k: shape_of(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(not isinstance(v, (dict, list, tuple)) for v in value):
+            return [f"<{type(value[0]).__name__}...>"]
+        return [shape_of(v) for v in value]
+    return f"<{type(value).__name__}>"
+
+
+def _plan_stages(plan, out):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            out.append(plan["stage"] + (f"({plan['indexName']})" if plan.get("indexName") else ""))
+        for v in plan.values():
+            _plan_stages(v, out)
+    elif isinstance(plan, list):
+        for v in plan:
+            _plan_stages(v, out)
+    return out
+
+
+def _find_key(doc, key):
+    """First value stored under `key` anywhere in an explain document (layouts differ per command/version)."""
+    if isinstance(doc, dict):
+        if key in doc:
+            return doc[key]
+        values = doc.values()
+    elif isinstance(doc, list):
+        values = doc
+    else:
+        return None
+    for v in values:
+        found = _find_key(v, key)
+        if found is not None:
+            return found
+    return None
+
+
+class QueryAuditor:
+    """Opt-in query-plan auditor (dev/staging).
+
+    A CommandListener records each distinct query shape the app issues (with the Flask endpoint that
+    issued it); a background thread explains new shapes once with executionStats and upserts the
+    result into `db.<collection_name>`, so the report covers every worker.
+    """
+
+    def __init__(self, get_db, collection_name="query_audit"):
+        self.get_db = get_db
+        self.collection_name = collection_name
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def listener(self):
+        return _AuditListener(self)
+
+    def observe(self, event, endpoint):
+        name = event.command_name
+        if name not in AUDITED_COMMANDS or event.database_name != self.get_db().name:
+            return
+        cmd = event.command
+        coll = cmd.get(name)
+        if not isinstance(coll, str) or coll == self.collection_name or coll.startswith("system."):
+            return
+        shape = {k: shape_of(v) for k, v in cmd.items() if k in _SHAPE_FIELDS}
+        key = repr((name, coll, endpoint, sorted(shape.items())))
+        with self._lock:
+            if key in self._seen:
+                return
+            self._seen.add(key)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="query-audit", daemon=True)
+                self._thread.start()
+        explain_cmd = {k: v for k, v in cmd.items() if not k.startswith("$") and k not in _STRIP}
+        self._queue.put((key, name, coll, endpoint, shape, explain_cmd))
+
+    def _loop(self):
+        while True:
+            self._explain(*self._queue.get())
+
+    def _explain(self, key, name, coll, endpoint, shape, explain_cmd):
+        db = self.get_db()
+        row = {"command": name, "collection": coll, "endpoint": endpoint, "shape": repr(shape), "checkedAt": datetime.utcnow()}
+        try:
+            res = db.command({"explain": explain_cmd, "verbosity": "executionStats"})
+            stages = _plan_stages(_find_key(res, "winningPlan") or {}, [])
+            stats = _find_key(res, "executionStats") or {}
+            row.update(
+                plan=" <- ".join(stages),
+                collscan=any(s.startswith("COLLSCAN") for s in stages),
+                docsExamined=stats.get("totalDocsExamined", 0),
+                keysExamined=stats.get("totalKeysExamined", 0),
+                nReturned=stats.get("nReturned", 0),
+                millis=stats.get("executionTimeMillis", 0),
+            )
+            row["cost"] = row["docsExamined"] / max(1, row["nReturned"])
+        except Exception as e:
+            row["error"] = str(e)
+        db[self.collection_name].update_one({"_id": key}, {"$set": row}, upsert=True)
+
+    def report(self, only_unindexed=False, limit=100):
+        """Audited shapes ranked worst first: collection scans, then docs examined per doc returned."""
+        query = {"collscan": True} if only_unindexed else {}
+        rows = list(self.get_db()[self.collection_name].find(query, {"_id": 0}))
+        rows.sort(key=lambda r: (not r.get("collscan"), -r.get("cost", 0), -r.get("docsExamined", 0)))
+        return rows[:limit]
+
+
+class _AuditListener(monitoring.CommandListener):
+    def __init__(self, auditor):
+        self.auditor = auditor
+
+    def started(self, event):
+        try:
+            endpoint = request.endpoint if has_request_context() else None
+            self.auditor.observe(event, endpoint)
+        except Exception:
+            pass  # auditing must never break the query it observes
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
@@ -0,0 +1,127 @@
+import threading
+import time
+
+from flask import Response, before_render_template, g, has_request_context, request, template_rendered
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    """Per-route latency histograms plus MongoDB and template time per request.
+
+    init_app() hooks the Flask app: every response gets a Server-Timing header (db, tpl, total) and
+    /metrics serves the per-process aggregates in Prometheus text format. MongoDB time is attributed
+    to the request through listener(), which must be passed to MongoClient(event_listeners=...).
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._routes = {}  # (endpoint, method) -> stats dict
+
+    def listener(self):
+        return _RequestCommandListener()
+
+    def init_app(self, app, path="/metrics"):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        before_render_template.connect(self._tpl_start, app)
+        template_rendered.connect(self._tpl_end, app)
+        app.add_url_rule(path, "metrics", self.render)
+
+    # ---- request hooks ----
+    def _start(self):
+        g._rm_start = time.perf_counter()
+        g._rm_db_count, g._rm_db_time, g._rm_tpl_time = 0, 0.0, 0.0
+
+    def _finish(self, response):
+        start = g.get("_rm_start")
+        if start is None:
+            return response
+        total = time.perf_counter() - start
+        db_count, db_time, tpl_time = g._rm_db_count, g._rm_db_time, g._rm_tpl_time
+        response.headers["Server-Timing"] = (
+            f'db;dur={db_time * 1000:.1f};desc="{db_count} queries", '
+            f"tpl;dur={tpl_time * 1000:.1f}, total;dur={total * 1000:.1f}"
+        )
+        if request.endpoint != "metrics":
+            self._observe(request.endpoint or "unmatched", request.method, total, db_count, db_time, tpl_time)
+        return response
+
+    def _tpl_start(self, sender, template, context, **extra):
+        if has_request_context():
+            g._rm_tpl_started = time.perf_counter()
+
+    def _tpl_end(self, sender, template, context, **extra):
+        started = g.get("_rm_tpl_started") if has_request_context() else None
+        if started is not None:
+            g._rm_tpl_time += time.perf_counter() - started
+            g._rm_tpl_started = None
+
+    def _observe(self, endpoint, method, total, db_count, db_time, tpl_time):
+        with self._lock:
+            s = self._routes.get((endpoint, method))
+            if s is None:
+                s = self._routes[(endpoint, method)] = {
+                    "buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0,
+                    "db_commands": 0, "db_seconds": 0.0, "template_seconds": 0.0,
+                }
+            for i, le in enumerate(self.buckets):
+                if total <= le:
+                    s["buckets"][i] += 1
+            s["count"] += 1
+            s["sum"] += total
+            s["db_commands"] += db_count
+            s["db_seconds"] += db_time
+            s["template_seconds"] += tpl_time
+
+    # ---- exposition ----
+    def render(self):
+        with self._lock:
+            routes = {k: dict(v, buckets=list(v["buckets"])) for k, v in self._routes.items()}
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by Flask endpoint.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (endpoint, method), s in sorted(routes.items()):
+            labels = f'endpoint="{endpoint}",method="{method}"'
+            for le, n in zip(self.buckets, s["buckets"]):
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{le}"}} {n}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {s["count"]}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {s['sum']:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {s['count']}")
+        for name, key, help_text in (
+            ("app_mongodb_commands_total", "db_commands", "MongoDB commands issued while serving requests."),
+            ("app_mongodb_seconds_total", "db_seconds", "Time spent in MongoDB commands while serving requests."),
+            ("app_template_render_seconds_total", "template_seconds", "Time spent rendering Jinja templates."),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (endpoint, method), s in sorted(routes.items()):
+                value = s[key] if isinstance(s[key], int) else f"{s[key]:.6f}"
+                lines.append(f'{name}{{endpoint="{endpoint}",method="{method}"}} {value}')
+        return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+class _RequestCommandListener(monitoring.CommandListener):
+    """Adds each command's duration to the current request (events fire on the issuing thread)."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._add(event)
+
+    def failed(self, event):
+        self._add(event)
+
+    @staticmethod
+    def _add(event):
+        record_db_command(event.duration_micros / 1e6)
+
+
+def record_db_command(seconds):
+    """Count one MongoDB command against the current request (no-op outside a timed request)."""
+    if has_request_context() and "_rm_db_count" in g:
+        g._rm_db_count += 1
+        g._rm_db_time += seconds
@@ -0,0 +1,167 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+WORDS = ("red", "blue", "green", "steel", "wool", "cotton", "classic", "pro", "mini", "max",
+         "lamp", "chair", "table", "shirt", "kettle", "phone", "cable", "bag", "shoe", "watch")
+COLORS = ("black", "white", "red", "blue", "green", "grey")
+MATERIALS = ("steel", "wool", "cotton", "oak", "plastic", "glass")
+SIZES = ("XS", "S", "M", "L", "XL")
+
+
+class BatchWriter:
+    """insert_many in fixed-size unordered batches; up to `workers` batches are in flight at once,
+    so generating the next batch overlaps with the server writing the previous ones."""
+
+    def __init__(self, coll, batch_size=1000, workers=4):
+        self.coll = coll
+        self.batch_size = batch_size
+        self._pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._futures = []
+        self._batch = []
+        self.written = 0
+
+    def add(self, doc):
+        self._batch.append(doc)
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+
+    def _insert(self, docs):
+        try:
+            self.coll.insert_many(docs, ordered=False)
+        finally:
+            self._slots.release()
+        return len(docs)
+
+    def _flush(self):
+        docs, self._batch = self._batch, []
+        if not docs:
+            return
+        self._slots.acquire()
+        if self._pool:
+            self._futures.append(self._pool.submit(self._insert, docs))
+        else:
+            self.written += self._insert(docs)
+
+    def close(self):
+        self._flush()
+        if self._pool:
+            self.written += sum(f.result() for f in self._futures)
+            self._pool.shutdown()
+        return self.written
+
+
+def category_levels(depth, branching, now=None, prefix=""):
+    """A full category tree, one list of docs per level (root level first); root names start with `prefix`.
+
+    Uses the app's path scheme: "Parent>Child" paths, parentId and the materialized ancestors array.
+    """
+    now = now or datetime.utcnow()
+    levels, parents = [], [None]
+    for d in range(depth):
+        level = []
+        for parent in parents:
+            for b in range(branching):
+                name = f"{prefix}Category {d}-{b}" if parent is None else f"{parent['name']}.{b}"
+                level.append({
+                    "_id": ObjectId(),
+                    "name": name,
+                    "parentId": parent["_id"] if parent else None,
+                    "path": f"{parent['path']}>{name}" if parent else name,
+                    "ancestors": (parent["ancestors"] + [parent["_id"]]) if parent else [],
+                    "createdAt": now,
+                })
+        levels.append(level)
+        parents = level
+    return levels
+
+
+def product_sku(i, prefix=""):
+    return f"SKU-{prefix}{i:08d}"
+
+
+def product_doc(i, rng, categories, created_at, stock=None, prefix=""):
+    cats = rng.sample(categories, min(len(categories), rng.randint(1, 2))) if categories else []
+    return {
+        "_id": ObjectId(),
+        "title": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(WORDS)} {i}",
+        "price": round(rng.uniform(1, 500), 2),
+        "sku": product_sku(i, prefix),
+        "categoryIds": [c["_id"] for c in cats],
+        "categoryPaths": [c["path"] for c in cats],
+        "imageIds": [],
+        "images": [],
+        "createdAt": created_at,
+        "status": "active" if rng.random() < 0.95 else "inactive",
+        "stock": rng.randint(0, 500) if stock is None else stock,
+        "extra_attrs": {
+            "color": rng.choice(COLORS),
+            "material": rng.choice(MATERIALS),
+            "size": rng.choice(SIZES),
+            "weight": f"{rng.randint(1, 5000)} g",
+        },
+    }
+
+
+def generate(db, products=10000, depth=3, branching=5, users=1000, carts_per_user=3, batch_size=1000,
+             workers=4, rng_seed=1, stock=None, email_format="user{}@example.com", password="password",
+             cart_schema_version=1, prefix="", log=print):
+    """Bulk-insert a synthetic data set; returns a summary with counts, elapsed seconds and docs/minute.
+
+    Products get `extra_attrs` and one or two categories (leaf or inner); every user gets
+    `carts_per_user` distinct cart items. `stock=None` means random stock per product.
+    SKUs, emails and root category names carry `prefix`, so runs with different prefixes can share
+    a database; ValueError (before anything is written) if this prefix was already seeded.
+    """
+    def email(i):
+        return email_format.format(f"{prefix}{i}")
+
+    if products and db.products.find_one({"sku": product_sku(0, prefix)}, {"_id": 1}) or \
+            users and db.users.find_one({"email": email(0)}, {"_id": 1}):
+        raise ValueError(f"synthetic data with prefix {prefix!r} already exists")
+    rng = random.Random(rng_seed)
+    started = time.perf_counter()
+    now = datetime.utcnow()
+
+    categories = []
+    for level in category_levels(depth, branching, now, prefix):
+        db.categories.insert_many(level, ordered=False)
+        categories += level
+    log(f"categories: {len(categories)}")
+
+    writer, product_ids = BatchWriter(db.products, batch_size, workers), []
+    for i in range(products):
+        doc = product_doc(i, rng, categories, now - timedelta(seconds=i), stock, prefix)
+        product_ids.append(doc["_id"])
+        writer.add(doc)
+        if (i + 1) % (batch_size * 50) == 0:
+            log(f"products: {i + 1}")
+    writer.close()
+    log(f"products: {len(product_ids)}")
+
+    writer, user_ids = BatchWriter(db.users, batch_size, workers), []
+    for i in range(users):
+        uid = ObjectId()
+        user_ids.append(uid)
+        writer.add({"_id": uid, "email": email(i), "name": f"User {prefix}{i}", "password": password,
+                    "isAdmin": False, "createdAt": now})
+    writer.close()
+    log(f"users: {len(user_ids)}")
+
+    writer = BatchWriter(db.carts, batch_size, workers)
+    per_user = min(carts_per_user, len(product_ids))
+    for uid in user_ids:
+        for pid in rng.sample(product_ids, per_user):
+            writer.add({"userId": uid, "product_id": pid, "qty": rng.randint(1, 3), "schemaVersion": cart_schema_version})
+    carts = writer.close()
+    log(f"cart items: {carts}")
+
+    elapsed = time.perf_counter() - started
+    total = len(categories) + len(product_ids) + len(user_ids) + carts
+    return {"categories": len(categories), "products": len(product_ids), "users": len(user_ids),
+            "cart_items": carts, "seconds": round(elapsed, 2), "docs_per_minute": int(total / elapsed * 60) if elapsed else 0}
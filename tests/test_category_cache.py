@@ -0,0 +1,73 @@
+import time
+import unittest
+
+import mongomock
+from bson import ObjectId
+
+from category_cache import CategoryCache, CategoryTree
+
+
+def cat(name, parent=None):
+    return {
+        "_id": ObjectId(), "name": name, "parentId": parent["_id"] if parent else None,
+        "path": f"{parent['path']}>{name}" if parent else name,
+        "ancestors": (parent["ancestors"] + [parent["_id"]]) if parent else [],
+    }
+
+
+class CategoryTreeTest(unittest.TestCase):
+    def setUp(self):
+        self.home = cat("Home")
+        self.lamps = cat("Lamps", self.home)
+        self.desk = cat("Desk", self.lamps)
+        self.garden = cat("Garden")
+        self.tree = CategoryTree([self.garden, self.desk, self.home, self.lamps], version=3)
+
+    def test_nodes_sorted_by_path(self):
+        self.assertEqual([c["path"] for c in self.tree.nodes], ["Garden", "Home", "Home>Lamps", "Home>Lamps>Desk"])
+
+    def test_lookups(self):
+        self.assertIs(self.tree.by_path["Home>Lamps"], self.lamps)
+        self.assertIs(self.tree.by_id[self.desk["_id"]], self.desk)
+        self.assertEqual(self.tree.children[None], [self.garden, self.home])
+
+    def test_descendant_ids(self):
+        ids = {self.home["_id"], self.lamps["_id"], self.desk["_id"]}
+        self.assertEqual(self.tree.descendant_ids([self.home["_id"]]), ids)
+        self.assertEqual(self.tree.descendant_ids([self.desk["_id"], self.garden["_id"]]),
+                         {self.desk["_id"], self.garden["_id"]})
+        self.assertEqual(self.tree.descendant_ids([]), set())
+
+
+class CategoryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.db = mongomock.MongoClient().db
+        self.db.categories.insert_one(cat("Home"))
+
+    def test_reload_on_version_bump(self):
+        writer, reader = CategoryCache(self.db, 0), CategoryCache(self.db, 0)
+        self.assertEqual(len(reader.tree().nodes), 1)
+        self.db.categories.insert_one(cat("Garden"))
+        self.assertEqual(len(reader.tree().nodes), 1)  # no bump yet: same version, same tree
+        writer.bump()
+        self.assertEqual(len(reader.tree().nodes), 2)
+
+    def test_check_interval_and_fresh(self):
+        writer, reader = CategoryCache(self.db, 0), CategoryCache(self.db, 60)
+        first = reader.tree()
+        self.db.categories.insert_one(cat("Garden"))
+        writer.bump()
+        self.assertIs(reader.tree(), first)  # within the check interval
+        self.assertIs(reader.peek(), first)
+        self.assertEqual(len(reader.tree(fresh=True).nodes), 2)
+
+    def test_peek_never_loads(self):
+        c = CategoryCache(self.db, 0.01)
+        self.assertIsNone(c.peek())
+        c.tree()
+        time.sleep(0.02)
+        self.assertIsNone(c.peek())
+
+
+if __name__ == "__main__":
+    unittest.main()
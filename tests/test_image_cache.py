@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from image_cache import ImageCache
+
+
+class MemoryTierTest(unittest.TestCase):
+    def test_lru_eviction_by_bytes(self):
+        c = ImageCache(max_bytes=300, max_item_bytes=1000)
+        for k in "abc":
+            c.put(k, {"k": k}, b"x" * 100)
+        c.get("a")  # a becomes most recently used
+        c.put("d", {}, b"x" * 100)
+        self.assertIsNone(c.get("b"))
+        self.assertIsNotNone(c.get("a"))
+        self.assertEqual(c.snapshot()["mem_bytes"], 300)
+        self.assertEqual(c.stats["evictions"], 1)
+
+    def test_items_over_the_item_limit_are_not_cached(self):
+        c = ImageCache(max_bytes=1000, max_item_bytes=10)
+        c.put("big", {}, b"x" * 11)
+        self.assertIsNone(c.get("big"))
+
+    def test_entries_expire_after_mem_ttl(self):
+        c = ImageCache(max_bytes=1000, max_item_bytes=1000, mem_ttl=0.01)
+        c.put("a", {}, b"1")
+        time.sleep(0.02)
+        self.assertIsNone(c.get("a"))
+        self.assertEqual(c.snapshot()["mem_bytes"], 0)
+
+    def test_discard(self):
+        c = ImageCache(max_bytes=1000, max_item_bytes=1000)
+        c.put("a", {}, b"1")
+        c.discard("a")
+        self.assertIsNone(c.get("a"))
+
+
+class DiskTierTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def cache(self, **kw):
+        kw.setdefault("disk_max_bytes", 10_000)
+        return ImageCache(max_bytes=10_000, max_item_bytes=10_000, disk_dir=self.dir, **kw)
+
+    def test_disk_hit_after_memory_eviction(self):
+        c = self.cache()
+        c.put("a", {"etag": "e"}, b"data")
+        c._mem.clear()
+        self.assertEqual(c.get("a"), ({"etag": "e"}, b"data"))
+        self.assertEqual(c.stats["disk_hits"], 1)
+
+    def test_files_written_by_another_worker_are_found(self):
+        a, b = self.cache(), self.cache()
+        a.put("k", {}, b"data")
+        self.assertEqual(b.get("k"), ({}, b"data"))
+        self.assertEqual(b.snapshot()["disk_items"], 1)
+
+    def test_budget_covers_the_shared_directory(self):
+        a, b = self.cache(disk_max_bytes=250), self.cache(disk_max_bytes=250)
+        a.DISK_RESCAN_SECONDS = b.DISK_RESCAN_SECONDS = 0
+        for cache, key in ((a, "k1"), (b, "k2"), (a, "k3")):
+            cache.put(key, {}, b"x" * 100)
+            time.sleep(0.01)  # distinct mtimes
+        self.assertEqual(sorted(os.listdir(self.dir)), ["k2.bin", "k2.json", "k3.bin", "k3.json"])
+        self.assertIsNone(b._disk_get("k1"))
+
+    def test_index_is_rebuilt_at_startup(self):
+        self.cache().put("a", {}, b"1234")
+        c = self.cache()
+        self.assertEqual(c.snapshot()["disk_bytes"], 4)
+
+    def test_discard_removes_files(self):
+        c = self.cache()
+        c.put("a", {}, b"1")
+        c.discard("a")
+        self.assertEqual(os.listdir(self.dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
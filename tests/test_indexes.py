@@ -0,0 +1,100 @@
+import unittest
+
+import mongomock
+from pymongo import ASCENDING, DESCENDING, TEXT
+
+from indexes import _key_signature, diff_indexes, ensure_indexes, find_duplicates
+
+SPECS = [
+    {"collection": "products", "keys": [("status", ASCENDING), ("createdAt", DESCENDING)]},
+    {"collection": "products", "keys": [("sku", ASCENDING)], "unique": True},
+]
+
+
+def quiet(*args):
+    pass
+
+
+class DiffIndexesTest(unittest.TestCase):
+    def setUp(self):
+        self.db = mongomock.MongoClient().db
+        self.db.products.insert_one({"sku": "A"})
+
+    def statuses(self, specs=SPECS):
+        return {(r["collection"], tuple(k for k, _ in r["keys"])): r["status"] for r in diff_indexes(self.db, specs)}
+
+    def test_missing(self):
+        self.assertEqual(set(self.statuses().values()), {"missing"})
+
+    def test_ok_conflict_and_undeclared(self):
+        self.db.products.create_index([("status", ASCENDING), ("createdAt", DESCENDING)])
+        self.db.products.create_index([("sku", ASCENDING)])  # not unique: options differ
+        self.db.products.create_index([("title", ASCENDING)])
+        self.assertEqual(self.statuses(), {
+            ("products", ("status", "createdAt")): "ok",
+            ("products", ("sku",)): "conflict",
+            ("products", ("title",)): "undeclared",
+        })
+
+    def test_direction_matters(self):
+        self.db.products.create_index([("status", ASCENDING), ("createdAt", ASCENDING)])
+        rows = diff_indexes(self.db, SPECS[:1])
+        self.assertEqual([r["status"] for r in rows], ["missing", "undeclared"])
+
+    def test_text_keys_compare_as_a_set(self):
+        self.assertEqual(_key_signature([("title", TEXT), ("body", TEXT)]),
+                         _key_signature([("body", TEXT), ("title", TEXT)]))
+        self.assertNotEqual(_key_signature([("title", TEXT)]), _key_signature([("title", ASCENDING)]))
+
+
+class EnsureIndexesTest(unittest.TestCase):
+    def setUp(self):
+        self.db = mongomock.MongoClient().db
+        self.db.products.insert_one({"sku": "A"})
+
+    def test_dry_run_creates_nothing(self):
+        rows = ensure_indexes(self.db, SPECS, dry_run=True, log=quiet)
+        self.assertEqual([r["status"] for r in rows], ["missing", "missing"])
+        self.assertEqual(list(self.db.products.index_information()), ["_id_"])
+
+    def test_creates_missing(self):
+        rows = ensure_indexes(self.db, SPECS, log=quiet)
+        self.assertEqual([r["status"] for r in rows], ["created", "created"])
+        self.assertTrue(self.db.products.index_information()["sku_1"]["unique"])
+        self.assertEqual({r["status"] for r in diff_indexes(self.db, SPECS)}, {"ok"})
+
+    def test_conflicts_are_only_rebuilt_on_request(self):
+        self.db.products.create_index([("sku", ASCENDING)])
+        spec = SPECS[1:]
+        self.assertEqual(ensure_indexes(self.db, spec, log=quiet)[0]["status"], "conflict")
+        self.assertNotIn("unique", self.db.products.index_information()["sku_1"])
+        self.assertEqual(ensure_indexes(self.db, spec, drop_conflicting=True, log=quiet)[0]["status"], "created")
+        self.assertTrue(self.db.products.index_information()["sku_1"]["unique"])
+
+
+class DuplicatesTest(unittest.TestCase):
+    SKU = {"collection": "products", "keys": [("sku", ASCENDING)], "unique": True, "sparse": True}
+
+    def setUp(self):
+        self.db = mongomock.MongoClient().db
+        self.db.products.insert_many([{"sku": "A"}, {"sku": "A"}, {"sku": "A"}, {"sku": "B"}, {"title": "no sku"}, {}])
+
+    def test_find_duplicates(self):
+        dups = find_duplicates(self.db, self.SKU)
+        self.assertEqual([(d["key"], d["count"], len(d["ids"])) for d in dups], [({"sku": "A"}, 3, 3)])
+
+    def test_missing_keys_count_unless_sparse(self):
+        dups = find_duplicates(self.db, dict(self.SKU, sparse=False))
+        self.assertEqual(sorted(d["count"] for d in dups), [2, 3])
+
+    def test_unique_index_is_not_built_over_duplicates(self):
+        self.db.products.create_index([("sku", ASCENDING)])
+        rows = ensure_indexes(self.db, [self.SKU], drop_conflicting=True, log=quiet)
+        self.assertEqual(rows[0]["status"], "duplicates")
+        self.assertIn("sku_1", self.db.products.index_information())  # the old index was kept
+        self.db.products.delete_many({"sku": "A", "_id": {"$ne": rows[0]["duplicates"][0]["ids"][0]}})
+        self.assertEqual(ensure_indexes(self.db, [self.SKU], drop_conflicting=True, log=quiet)[0]["status"], "created")
+
+
+if __name__ == "__main__":
+    unittest.main()
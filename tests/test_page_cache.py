@@ -0,0 +1,102 @@
+import asyncio
+import unittest
+
+from flask import Flask, flash
+from flask_login import LoginManager, UserMixin
+
+from page_cache import PageCache
+
+
+class User(UserMixin):
+    def __init__(self, uid):
+        self.id = uid
+
+
+def make_app(cache):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    LoginManager(app).user_loader(lambda uid: User(uid))
+    app.calls = 0
+
+    @app.route("/page")
+    @cache.cached
+    def page():
+        app.calls += 1
+        return f"page {app.calls}"
+
+    @app.route("/missing")
+    @cache.cached
+    def missing():
+        app.calls += 1
+        return "nope", 404
+
+    @app.route("/flash")
+    def set_flash():
+        flash("hello")
+        return "ok"
+
+    return app
+
+
+class PageCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = PageCache(ttl=60, max_items=10)
+        self.app = make_app(self.cache)
+        self.client = self.app.test_client()
+
+    def test_anonymous_get_is_cached(self):
+        first = self.client.get("/page")
+        second = self.client.get("/page")
+        self.assertEqual((first.headers["X-Cache"], second.headers["X-Cache"]), ("MISS", "HIT"))
+        self.assertEqual(second.data, b"page 1")
+        self.assertEqual(self.app.calls, 1)
+
+    def test_key_ignores_query_argument_order(self):
+        self.client.get("/page?a=1&b=2")
+        self.assertEqual(self.client.get("/page?b=2&a=1").headers["X-Cache"], "HIT")
+        self.assertEqual(self.client.get("/page?a=1&b=3").headers["X-Cache"], "MISS")
+
+    def test_logged_in_users_bypass(self):
+        with self.client.session_transaction() as s:
+            s["_user_id"] = "1"
+        self.client.get("/page")
+        r = self.client.get("/page")
+        self.assertNotIn("X-Cache", r.headers)
+        self.assertEqual(self.app.calls, 2)
+        self.assertEqual(self.cache.stats["bypassed"], 2)
+
+    def test_pending_flashes_bypass(self):
+        self.client.get("/flash")
+        self.assertNotIn("X-Cache", self.client.get("/page").headers)
+        self.assertEqual(self.cache.stats["bypassed"], 1)
+
+    def test_non_200_is_not_stored(self):
+        self.client.get("/missing")
+        self.client.get("/missing")
+        self.assertEqual(self.app.calls, 2)
+
+    def test_invalidate(self):
+        self.client.get("/page")
+        self.cache.invalidate()
+        self.assertEqual(self.client.get("/page").headers["X-Cache"], "MISS")
+
+    def test_cached_async(self):
+        calls = []
+
+        @self.cache.cached_async
+        async def view():
+            calls.append(1)
+            return "async page"
+
+        for expected in ("MISS", "HIT"):
+            with self.app.test_request_context("/async"):
+                self.assertEqual(asyncio.run(view()).headers["X-Cache"], expected)
+        with self.app.test_request_context("/async"):
+            from flask import session
+            session["_user_id"] = "1"
+            self.assertEqual(asyncio.run(view()), "async page")
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import io
+import json
+import unittest
+
+import mongomock
+from bson import ObjectId
+
+from category_cache import CategoryTree
+from product_io import RowError, export_products, import_products, product_fields, read_rows
+
+HOME = {"_id": ObjectId(), "name": "Home", "parentId": None, "path": "Home", "ancestors": []}
+TREE = CategoryTree([HOME], version=1)
+
+
+def csv_rows(text):
+    return read_rows(io.StringIO(text), "csv")
+
+
+class ProductFieldsTest(unittest.TestCase):
+    def test_required_columns(self):
+        for row, message in (
+            ({"title": "t", "price": "1"}, "sku is required"),
+            ({"sku": "A", "price": "1"}, "title is required"),
+            ({"sku": "A", "title": "t", "price": "x"}, "price must be a number"),
+            ({"sku": "A", "title": "t", "price": "-1"}, "price must not be negative"),
+        ):
+            with self.assertRaisesRegex(RowError, message):
+                product_fields(row, TREE)
+
+    def test_invalid_values(self):
+        base = {"sku": "A", "title": "t", "price": "1"}
+        for extra in ({"stock": "many"}, {"status": "deleted"}, {"categories": "Nowhere"}, {"extra_attrs": "{"}):
+            with self.assertRaises(RowError):
+                product_fields(dict(base, **extra), TREE)
+
+    def test_full_row(self):
+        fields, defaults = product_fields({
+            "sku": " A ", "title": "Lamp", "price": "9.5", "stock": "3", "status": "Inactive",
+            "categories": "Home", "extra_attrs": '{"color": "red"}', "attr.size": "L",
+        }, TREE)
+        self.assertEqual(fields, {
+            "sku": "A", "title": "Lamp", "price": 9.5, "stock": 3, "status": "inactive",
+            "categoryIds": [HOME["_id"]], "categoryPaths": ["Home"], "extra_attrs": {"color": "red", "size": "L"},
+        })
+        self.assertEqual(defaults, {})
+
+    def test_blank_and_missing_cells_are_not_written(self):
+        for row in ({"sku": "A", "title": "t", "price": "1"},
+                    {"sku": "A", "title": "t", "price": "1", "stock": "", "status": "", "categories": "", "extra_attrs": ""}):
+            fields, defaults = product_fields(row, TREE)
+            self.assertEqual(set(fields), {"sku", "title", "price"})
+            self.assertEqual(defaults, {"stock": 0, "status": "active", "categoryIds": [], "categoryPaths": []})
+
+    def test_jsonl_empty_categories_clear_them(self):
+        fields, _ = product_fields({"sku": "A", "title": "t", "price": 1, "categories": []}, TREE)
+        self.assertEqual((fields["categoryIds"], fields["categoryPaths"]), ([], []))
+
+
+class ReadRowsTest(unittest.TestCase):
+    def test_jsonl_errors_carry_line_numbers(self):
+        rows = list(read_rows(io.StringIO('{"sku": "A"}\n\nnot json\n[1]\n'), "jsonl"))
+        self.assertEqual(rows[0], (1, {"sku": "A"}))
+        self.assertEqual([(n, type(r)) for n, r in rows[1:]], [(3, RowError), (4, RowError)])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            list(read_rows(io.StringIO(""), "xml"))
+
+
+class ImportExportTest(unittest.TestCase):
+    def setUp(self):
+        self.db = mongomock.MongoClient().db
+
+    def test_upsert_by_sku(self):
+        stats = import_products(self.db, csv_rows("sku,title,price,stock\nA,Lamp,5,2\nB,Chair,7,1\n"), TREE)
+        self.assertEqual((stats["inserted"], stats["updated"]), (2, 0))
+        stats = import_products(self.db, csv_rows("sku,title,price,stock\nA,Lamp v2,6,\n"), TREE)
+        self.assertEqual((stats["inserted"], stats["updated"]), (0, 1))
+        a = self.db.products.find_one({"sku": "A"})
+        self.assertEqual((a["title"], a["price"], a["stock"]), ("Lamp v2", 6.0, 2))  # blank stock left alone
+        self.assertEqual((a["imageIds"], a["status"]), ([], "active"))
+        self.assertEqual(self.db.products.count_documents({}), 2)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        stats = import_products(self.db, csv_rows("sku,title,price\nA,Lamp,5\n,No sku,1\nC,Bad,x\n"), TREE)
+        self.assertEqual((stats["rows"], stats["valid"], stats["error_count"]), (3, 1, 2))
+        self.assertEqual([line for line, _ in stats["errors"]], [3, 4])
+        self.assertEqual(self.db.products.count_documents({}), 1)
+
+    def test_last_row_for_a_sku_wins(self):
+        import_products(self.db, csv_rows("sku,title,price\nA,first,1\nA,second,2\n"), TREE, batch_size=10)
+        self.assertEqual(self.db.products.find_one({"sku": "A"})["title"], "second")
+
+    def test_dry_run_writes_nothing(self):
+        stats = import_products(self.db, csv_rows("sku,title,price\nA,Lamp,5\n"), TREE, dry_run=True)
+        self.assertEqual(stats["valid"], 1)
+        self.assertEqual(self.db.products.count_documents({}), 0)
+
+    def test_export_round_trip(self):
+        import_products(self.db, csv_rows(
+            'sku,title,price,stock,status,categories,extra_attrs\nA,Lamp,5,2,active,Home,"{""color"": ""red""}"\n'), TREE)
+        csv_text = "".join(export_products(self.db, "csv"))
+        self.assertEqual(csv_text.splitlines()[1], 'A,Lamp,5.0,2,active,Home,"{""color"": ""red""}"')
+        doc = json.loads("".join(export_products(self.db, "jsonl")))
+        self.assertEqual(doc["categories"], ["Home"])
+        self.db.products.delete_many({})
+        import_products(self.db, csv_rows(csv_text), TREE)
+        self.assertEqual(self.db.products.find_one({"sku": "A"})["extra_attrs"], {"color": "red"})
+
+
+if __name__ == "__main__":
+    unittest.main()
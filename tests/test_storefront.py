@@ -0,0 +1,106 @@
+import unittest
+from datetime import datetime, timedelta
+
+import mongomock
+from bson import ObjectId
+
+import flask_ecommerce as shop
+
+
+def page(coll, size, after=None, before=None):
+    q, sort, pos, backwards = shop.keyset_find_args({"status": "active"}, after, before)
+    docs = list(coll.find(q).sort(sort).limit(size + 1))
+    docs, next_cursor, prev_cursor = shop.keyset_result(docs, size, pos, backwards)
+    return [d["n"] for d in docs], next_cursor, prev_cursor
+
+
+class KeysetPagingTest(unittest.TestCase):
+    def setUp(self):
+        self.coll = mongomock.MongoClient().db.products
+        now = datetime(2024, 1, 1)
+        # 7 active products, newest first by n; two pairs share a createdAt to exercise the _id tiebreak
+        stamps = [now, now, now - timedelta(seconds=1), now - timedelta(seconds=2), now - timedelta(seconds=2),
+                  now - timedelta(seconds=3), now - timedelta(seconds=4)]
+        for n, ts in enumerate(stamps):
+            self.coll.insert_one({"_id": ObjectId(), "n": n, "createdAt": ts, "status": "active"})
+        self.order = [d["n"] for d in self.coll.find().sort([("createdAt", -1), ("_id", -1)])]
+        self.coll.insert_one({"_id": ObjectId(), "n": 99, "createdAt": now, "status": "inactive"})
+
+    def test_forward_walk_visits_every_product_once(self):
+        seen, cursor = [], None
+        while True:
+            ns, cursor, _ = page(self.coll, 3, after=cursor)
+            seen += ns
+            if not cursor:
+                break
+        self.assertEqual(seen, self.order)
+
+    def test_first_page_has_no_prev(self):
+        ns, next_cursor, prev_cursor = page(self.coll, 3)
+        self.assertEqual(ns, self.order[:3])
+        self.assertIsNotNone(next_cursor)
+        self.assertIsNone(prev_cursor)
+
+    def test_backward_page_returns_the_previous_slice(self):
+        _, cursor, _ = page(self.coll, 3)
+        second, _, prev_cursor = page(self.coll, 3, after=cursor)
+        self.assertEqual(second, self.order[3:6])
+        back, next_cursor, prev_again = page(self.coll, 3, before=prev_cursor)
+        self.assertEqual(back, self.order[:3])
+        self.assertIsNotNone(next_cursor)
+        self.assertIsNone(prev_again)
+
+    def test_cursor_round_trip_and_garbage(self):
+        doc = {"_id": ObjectId(), "createdAt": datetime(2024, 5, 6, 7, 8, 9, 123000)}
+        self.assertEqual(shop.decode_cursor(shop.encode_cursor(doc)), (doc["createdAt"], doc["_id"]))
+        for token in (None, "", "abc", "12-xyz", "12-" + "0" * 23):
+            self.assertIsNone(shop.decode_cursor(token))
+        self.assertNotIn("$or", shop.keyset_find_args({}, after="junk")[0])
+
+
+class CartFixOpsTest(unittest.TestCase):
+    def setUp(self):
+        self.carts = mongomock.MongoClient().db.carts  # legacy carts predate the unique (userId, product_id) index
+        self.user = ObjectId()
+
+    def fix(self):
+        items = list(self.carts.find({"userId": self.user}))
+        ops = shop._cart_fix_ops(items)
+        if ops:
+            self.carts.bulk_write(ops, ordered=True)
+        return ops
+
+    def cart(self):
+        return sorted(((d["product_id"], d["qty"], d.get("schemaVersion")) for d in self.carts.find()), key=str)
+
+    def test_canonical_cart_needs_no_ops(self):
+        self.carts.insert_one({"userId": self.user, "product_id": ObjectId(), "qty": 1,
+                               "schemaVersion": shop.CART_SCHEMA_VERSION})
+        self.assertEqual(self.fix(), [])
+
+    def test_legacy_fields_are_renamed_and_stamped(self):
+        a, b = ObjectId(), ObjectId()
+        self.carts.insert_many([{"userId": self.user, "productId": str(a), "qty": 2},
+                                {"userId": self.user, "pid": f"ObjectId('{b}')", "qty": 1}])
+        self.fix()
+        self.assertEqual(self.cart(), sorted([(a, 2, shop.CART_SCHEMA_VERSION), (b, 1, shop.CART_SCHEMA_VERSION)], key=str))
+        self.assertEqual(self.carts.count_documents({"$or": [{"productId": {"$exists": True}}, {"pid": {"$exists": True}}]}), 0)
+
+    def test_duplicates_merge_into_the_canonical_doc(self):
+        a = ObjectId()
+        keep = self.carts.insert_one({"userId": self.user, "product_id": a, "qty": 1}).inserted_id
+        self.carts.insert_many([{"userId": self.user, "productId": str(a), "qty": 2},
+                                {"userId": self.user, "pid": a, "qty": 3}])
+        self.fix()
+        self.assertEqual(self.cart(), [(a, 6, shop.CART_SCHEMA_VERSION)])
+        self.assertEqual(self.carts.find_one()["_id"], keep)
+
+    def test_invalid_items_are_dropped(self):
+        self.carts.insert_many([{"userId": self.user, "productId": "not-an-id", "qty": 1},
+                                {"userId": self.user, "qty": 1}])
+        self.fix()
+        self.assertEqual(self.carts.count_documents({}), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()